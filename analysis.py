@@ -0,0 +1,83 @@
+"""
+Heuristic credibility analysis shared by the Streamlit app and other entry points.
+
+The pattern lists, thresholds and score deltas live in the rule file loaded
+by rules.py.
+"""
+from rules import LiveEvaluator, registry
+
+
+def verdict_for_score(credibility_score):
+    """
+    Map a 0-100 credibility score to its verdict and summary text
+    """
+    if credibility_score >= 65:
+        return 'reliable', 'This content shows strong characteristics of reliable information with proper sourcing, balanced perspective, and factual content. However, always verify important claims from multiple sources.'
+    elif credibility_score >= 35:
+        return 'questionable', 'This content has significant red flags that warrant caution. Multiple indicators suggest potential bias or misinformation. Cross-check facts with established news sources before sharing.'
+    else:
+        return 'unreliable', 'This content exhibits numerous warning signs commonly found in misinformation, including clickbait, lack of sources, emotional manipulation, or conspiracy language. Exercise extreme caution and verify all claims independently.'
+
+
+# Characters read per chunk when streaming a document from a file
+CHUNK_CHARS = 1024 * 1024
+
+
+def advanced_fake_news_analysis(text, rules=None):
+    """
+    Advanced fake news detection using multiple sophisticated heuristics
+    """
+    return _result(*(rules or registry.current()).evaluate(text))
+
+
+def analyze_stream(chunks, rules=None):
+    """
+    Analyze a long document given as an iterable of text chunks, with the
+    same result as advanced_fake_news_analysis on their concatenation but
+    memory bounded by the chunk size instead of the document size
+    """
+    return _result(*(rules or registry.current()).evaluate_stream(chunks))
+
+
+def analyze_file(path, chunk_chars=CHUNK_CHARS, encoding='utf-8', rules=None):
+    """
+    Stream a text file through analyze_stream
+    """
+    with open(path, encoding=encoding, errors='replace') as f:
+        return analyze_stream(iter(lambda: f.read(chunk_chars), ''), rules)
+
+
+class LiveAnalysis:
+    """
+    Re-analyzes a text as it is edited, scanning only the paragraphs (or, in
+    long paragraphs, sentences) that changed since the previous versions and
+    the ones a match could span with them.
+    Each result equals advanced_fake_news_analysis of the same text with the
+    rules current at the time.
+    """
+
+    def __init__(self, rules=None):
+        self._rules = rules
+        self._evaluator = None
+
+    def analyze(self, text):
+        rules = self._rules or registry.current()
+        if self._evaluator is None or self._evaluator.rules is not rules:
+            self._evaluator = LiveEvaluator(rules)
+        return _result(*self._evaluator.evaluate(text))
+
+
+def _result(factors, total_score):
+    """
+    Build the analysis result dict from the evaluated factors
+    """
+    credibility_score = max(0, min(100, total_score))
+
+    verdict, summary = verdict_for_score(credibility_score)
+
+    return {
+        'credibility_score': credibility_score,
+        'verdict': verdict,
+        'factors': factors,
+        'summary': summary
+    }
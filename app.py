@@ -1,8 +1,19 @@
+import os
 import streamlit as st
-import re
 import time
-import pandas as pd
-from collections import Counter
+from contextlib import nullcontext
+
+from cache import cached_analysis
+from metrics import collect_trace, record, start_metrics_server, timed
+from pool import RESULT_TOP_K, AnalysisPool, PoolBusy
+from store import STORE_PATH, ResultStore
+
+HEURISTIC_MODE = "🧩 Heuristic Analysis"
+MODEL_MODE = "🤖 Trained Model"
+HYBRID_MODE = "⚖️ Hybrid"
+ANALYSIS_KINDS = {HEURISTIC_MODE: 'heuristic', MODEL_MODE: 'model', HYBRID_MODE: 'hybrid'}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Page configuration
 st.set_page_config(
@@ -12,604 +23,53 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS for styling
-st.markdown("""
-<style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-    
-    /* Global Styles */
-    .stApp {
-        background: linear-gradient(to bottom, #0f172a, #1e293b, #0f172a);
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Main container */
-    .main .block-container {
-        padding-top: 2rem;
-        padding-bottom: 2rem;
-        max-width: 1200px;
-    }
-    
-    /* Hero Section */
-    .hero-title {
-        font-size: 4rem;
-        font-weight: 700;
-        text-align: center;
-        background: linear-gradient(to right, #ffffff, #3b82f6, #ffffff);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 1rem;
-        line-height: 1.2;
-    }
-    
-    .hero-subtitle {
-        font-size: 1.5rem;
-        text-align: center;
-        color: #cbd5e1;
-        margin-bottom: 2rem;
-        line-height: 1.6;
-    }
-    
-    /* Badge */
-    .badge {
-        display: inline-flex;
-        align-items: center;
-        gap: 0.5rem;
-        padding: 0.5rem 1.25rem;
-        background: linear-gradient(to right, rgba(59, 130, 246, 0.2), rgba(168, 85, 247, 0.2));
-        border: 1px solid rgba(59, 130, 246, 0.3);
-        border-radius: 9999px;
-        font-size: 0.875rem;
-        color: #3b82f6;
-        margin-bottom: 1.5rem;
-        backdrop-filter: blur(10px);
-    }
-    
-    /* Glass Card Effect */
-    .glass-card {
-        background: rgba(30, 41, 59, 0.6);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        border-radius: 1rem;
-        padding: 2rem;
-        box-shadow: 0 25px 50px -12px rgba(0, 0, 0, 0.5);
-        margin-bottom: 2rem;
-    }
-    
-    /* Stats Grid */
-    .stats-container {
-        display: grid;
-        grid-template-columns: repeat(3, 1fr);
-        gap: 1rem;
-        margin: 2rem 0;
-    }
-    
-    .stat-card {
-        background: rgba(255, 255, 255, 0.05);
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 0.75rem;
-        padding: 1.5rem;
-        text-align: center;
-    }
-    
-    .stat-value {
-        font-size: 2rem;
-        font-weight: 700;
-        color: #ffffff;
-        margin: 0.5rem 0;
-    }
-    
-    .stat-label {
-        font-size: 0.875rem;
-        color: #94a3b8;
-    }
-    
-    /* Verdict Badge */
-    .verdict-badge {
-        display: inline-flex;
-        align-items: center;
-        gap: 0.5rem;
-        padding: 0.75rem 1.5rem;
-        border-radius: 0.5rem;
-        font-size: 1.125rem;
-        font-weight: 600;
-        margin: 1rem 0;
-    }
-    
-    .verdict-reliable {
-        background: linear-gradient(to right, #22c55e, #16a34a);
-        color: white;
-        box-shadow: 0 0 20px rgba(34, 197, 94, 0.3);
-    }
-    
-    .verdict-questionable {
-        background: linear-gradient(to right, #eab308, #f59e0b);
-        color: white;
-        box-shadow: 0 0 20px rgba(234, 179, 8, 0.3);
-    }
-    
-    .verdict-unreliable {
-        background: linear-gradient(to right, #ef4444, #dc2626);
-        color: white;
-        box-shadow: 0 0 20px rgba(239, 68, 68, 0.3);
-    }
-    
-    /* Factor Cards */
-    .factor-card {
-        background: linear-gradient(to bottom right, rgba(30, 41, 59, 0.8), rgba(30, 41, 59, 0.4));
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 0.75rem;
-        padding: 1.5rem;
-        margin-bottom: 1rem;
-        transition: all 0.3s;
-    }
-    
-    .factor-card:hover {
-        border-color: rgba(59, 130, 246, 0.3);
-        transform: translateX(5px);
-    }
-    
-    .factor-title {
-        font-size: 1.125rem;
-        font-weight: 600;
-        color: #ffffff;
-        margin-bottom: 0.5rem;
-    }
-    
-    .factor-description {
-        font-size: 0.875rem;
-        color: #94a3b8;
-        line-height: 1.6;
-    }
-    
-    /* Status Icons */
-    .status-icon {
-        display: inline-flex;
-        padding: 0.5rem;
-        border-radius: 9999px;
-        margin-right: 1rem;
-    }
-    
-    .status-pass {
-        background: rgba(34, 197, 94, 0.2);
-        border: 1px solid rgba(34, 197, 94, 0.5);
-        color: #22c55e;
-    }
-    
-    .status-warning {
-        background: rgba(234, 179, 8, 0.2);
-        border: 1px solid rgba(234, 179, 8, 0.5);
-        color: #eab308;
-    }
-    
-    .status-fail {
-        background: rgba(239, 68, 68, 0.2);
-        border: 1px solid rgba(239, 68, 68, 0.5);
-        color: #ef4444;
-    }
-    
-    /* Tips Grid */
-    .tips-grid {
-        display: grid;
-        grid-template-columns: repeat(2, 1fr);
-        gap: 1.5rem;
-        margin-top: 2rem;
-    }
-    
-    .tip-card {
-        background: rgba(30, 41, 59, 0.6);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        border-radius: 1rem;
-        padding: 2rem;
-        transition: all 0.3s;
-    }
-    
-    .tip-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 25px 50px -12px rgba(59, 130, 246, 0.3);
-    }
-    
-    .tip-icon {
-        width: 3rem;
-        height: 3rem;
-        border-radius: 1rem;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-size: 1.5rem;
-        margin-bottom: 1rem;
-    }
-    
-    .tip-title {
-        font-size: 1.25rem;
-        font-weight: 600;
-        color: #ffffff;
-        margin-bottom: 0.75rem;
-    }
-    
-    .tip-description {
-        font-size: 0.9375rem;
-        color: #94a3b8;
-        line-height: 1.6;
-    }
-    
-    /* Streamlit Input Overrides */
-    .stTextArea textarea {
-        background: rgba(30, 41, 59, 0.5);
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        border-radius: 0.5rem;
-        color: #ffffff;
-        min-height: 200px;
-    }
-    
-    .stTextInput input {
-        background: rgba(30, 41, 59, 0.5);
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        border-radius: 0.5rem;
-        color: #ffffff;
-    }
-    
-    /* Button Styling */
-    .stButton button {
-        width: 100%;
-        background: linear-gradient(to right, #3b82f6, rgba(59, 130, 246, 0.8));
-        color: white;
-        font-weight: 600;
-        padding: 0.75rem 2rem;
-        border: none;
-        border-radius: 0.5rem;
-        box-shadow: 0 10px 25px -5px rgba(59, 130, 246, 0.25);
-        transition: all 0.3s;
-    }
-    
-    .stButton button:hover {
-        background: linear-gradient(to right, rgba(59, 130, 246, 0.9), rgba(59, 130, 246, 0.7));
-        transform: scale(1.02);
-    }
-    
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 0.5rem;
-        background: rgba(148, 163, 184, 0.1);
-        padding: 0.25rem;
-        border-radius: 0.5rem;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        background: transparent;
-        border-radius: 0.375rem;
-        color: #94a3b8;
-        padding: 0.5rem 1rem;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background: linear-gradient(to right, #3b82f6, rgba(59, 130, 246, 0.8));
-        color: white;
-    }
-    
-    /* Alert Box */
-    .alert-box {
-        background: rgba(59, 130, 246, 0.1);
-        border: 1px solid rgba(59, 130, 246, 0.3);
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 1rem 0;
-        color: #cbd5e1;
-        font-size: 0.875rem;
-    }
-    
-    /* Section Divider */
-    .section-divider {
-        height: 2px;
-        background: linear-gradient(to right, transparent, #3b82f6, transparent);
-        margin: 3rem 0;
-    }
-    
-    /* Section Title */
-    .section-title {
-        font-size: 2.5rem;
-        font-weight: 700;
-        text-align: center;
-        background: linear-gradient(to right, #ffffff, #94a3b8);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin: 2rem 0 1rem 0;
-    }
-    
-    .section-subtitle {
-        font-size: 1.125rem;
-        text-align: center;
-        color: #64748b;
-        margin-bottom: 2rem;
-    }
-    
-    /* Centered Text */
-    .centered {
-        text-align: center;
-    }
-    
-    /* Feature Pills */
-    .feature-pills {
-        display: flex;
-        justify-content: center;
-        gap: 1rem;
-        flex-wrap: wrap;
-        margin: 1.5rem 0;
-    }
-    
-    .feature-pill {
-        display: inline-flex;
-        align-items: center;
-        gap: 0.5rem;
-        padding: 0.5rem 1rem;
-        background: rgba(255, 255, 255, 0.05);
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 9999px;
-        font-size: 0.875rem;
-        color: #cbd5e1;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-
-def advanced_fake_news_analysis(text):
-    """
-    Advanced fake news detection using multiple sophisticated heuristics
-    """
-    factors = []
-    total_score = 50  # Start from neutral position
-    text_lower = text.lower()
-
-    # 1. CLICKBAIT & SENSATIONALISM
-    clickbait_patterns = [
-        r'\byou won\'t believe\b',
-        r'\bshocking\b',
-        r'\bunbelievable\b',
-        r'\bmiracle\b',
-        r'\bsecret\b.*\brevealed\b',
-        r'\bexposed\b',
-        r'\bthis\s+one\s+trick\b',
-        r'\bwhat\s+happened\s+next\b',
-        r'\bnumber\s+\d+\s+will\b',
-        r'\bdoctors\s+hate\b',
-        r'\bthey\s+don\'t\s+want\s+you\s+to\s+know\b'
-    ]
-    clickbait_count = sum(1 for pattern in clickbait_patterns if re.search(pattern, text_lower))
-
-    if clickbait_count >= 3:
-        factors.append({'name': 'Clickbait Language', 'status': 'fail',
-                        'description': f'Contains {clickbait_count} clickbait patterns often used in fake news to manipulate readers.'})
-        total_score -= 25
-    elif clickbait_count >= 1:
-        factors.append({'name': 'Clickbait Language', 'status': 'warning',
-                        'description': f'Contains {clickbait_count} clickbait-style phrases. Exercise caution.'})
-        total_score -= 12
-    else:
-        factors.append({'name': 'Clickbait Language', 'status': 'pass',
-                        'description': 'No significant clickbait patterns detected.'})
-        total_score += 10
-
-    # 2. CONSPIRACY THEORY INDICATORS
-    conspiracy_patterns = [
-        r'\bthey\s+don\'t\s+want\b',
-        r'\bcover[\s-]?up\b',
-        r'\bhidden\s+agenda\b',
-        r'\bwake\s+up\b.*\bsheeple\b',
-        r'\bmainstream\s+media\b.*\blying\b',
-        r'\bdeep\s+state\b',
-        r'\billuminati\b',
-        r'\bnew\s+world\s+order\b'
-    ]
-    conspiracy_count = sum(1 for pattern in conspiracy_patterns if re.search(pattern, text_lower))
-
-    if conspiracy_count >= 2:
-        factors.append({'name': 'Conspiracy Indicators', 'status': 'fail',
-                        'description': 'Contains multiple conspiracy theory markers commonly found in misinformation.'})
-        total_score -= 30
-    elif conspiracy_count >= 1:
-        factors.append({'name': 'Conspiracy Indicators', 'status': 'warning',
-                        'description': 'Contains language associated with conspiracy theories.'})
-        total_score -= 15
-    else:
-        factors.append({'name': 'Conspiracy Indicators', 'status': 'pass',
-                        'description': 'No conspiracy theory language detected.'})
-        total_score += 10
-
-    # 3. SOURCE VERIFICATION
-    credible_sources = [
-        r'\breuters\b', r'\bassociated press\b', r'\bap news\b', r'\bbbc\b',
-        r'\bnpr\b', r'\bpbs\b', r'\bthe new york times\b', r'\bthe washington post\b',
-        r'\bthe guardian\b', r'\baccording to (dr\.|professor|expert)\b',
-        r'\bpublished in\b.*\bjournal\b', r'\bstudy (published|conducted|shows)\b',
-        r'\bresearch (from|by|published)\b', r'\buniversity of\b', r'\binstitute of\b'
-    ]
-    credible_source_count = sum(1 for pattern in credible_sources if re.search(pattern, text_lower))
 
-    vague_sources = [
-        r'\bsome people say\b', r'\bmany believe\b', r'\bits been reported\b',
-        r'\bsources say\b', r'\bexperts claim\b',
-        r'\bstudies show\b' if not re.search(r'study (published|conducted)', text_lower) else None
-    ]
-    vague_source_count = sum(1 for pattern in vague_sources if pattern and re.search(pattern, text_lower))
-
-    if credible_source_count >= 2:
-        factors.append({'name': 'Source Credibility', 'status': 'pass',
-                        'description': f'References {credible_source_count} credible sources or institutions.'})
-        total_score += 20
-    elif credible_source_count >= 1:
-        factors.append({'name': 'Source Credibility', 'status': 'pass',
-                        'description': 'Contains some credible source references.'})
-        total_score += 10
-    elif vague_source_count >= 2:
-        factors.append({'name': 'Source Credibility', 'status': 'fail',
-                        'description': 'Uses vague, unverifiable source attributions instead of specific sources.'})
-        total_score -= 20
-    else:
-        factors.append({'name': 'Source Credibility', 'status': 'warning',
-                        'description': 'Limited or no clear source attributions found.'})
-        total_score -= 10
-
-    # 4. EMOTIONAL MANIPULATION
-    extreme_emotions = [
-        r'\boutraged?\b', r'\bfurious\b', r'\bdevastating\b', r'\bterrifying\b',
-        r'\bhorrifying\b', r'\bdisgust(ing|ed)\b', r'\bappalling\b',
-        r'\bscandal(ous)?\b', r'\bshame(ful)?\b'
-    ]
-    emotion_count = sum(1 for pattern in extreme_emotions if re.search(pattern, text_lower))
-    sentences = re.split(r'[.!?]+', text)
-    emotional_density = emotion_count / max(len(sentences), 1)
-
-    if emotional_density > 0.5:
-        factors.append({'name': 'Emotional Manipulation', 'status': 'fail',
-                        'description': 'Extremely high emotional language density suggests manipulation over facts.'})
-        total_score -= 25
-    elif emotion_count > 5:
-        factors.append({'name': 'Emotional Manipulation', 'status': 'warning',
-                        'description': 'High use of emotional language may indicate bias or manipulation.'})
-        total_score -= 12
-    elif emotion_count > 0:
-        factors.append({'name': 'Emotional Language', 'status': 'pass',
-                        'description': 'Contains some emotional language, which is normal for news reporting.'})
-        total_score += 5
-    else:
-        factors.append({'name': 'Emotional Balance', 'status': 'pass',
-                        'description': 'Maintains neutral, objective tone throughout.'})
-        total_score += 15
-
-    # 5. FACTUAL INDICATORS
-    fact_patterns = [
-        r'\b\d+%\b',
-        r'\b\d+\s+(people|deaths|cases|dollars|million|billion)\b',
-        r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d+,?\s+\d{4}\b',
-        r'\b\d{4}\b.*\bstudy\b',
-        r'\bdata (shows|indicates|suggests)\b'
-    ]
-    fact_count = sum(1 for pattern in fact_patterns if re.search(pattern, text_lower))
-
-    if fact_count >= 3:
-        factors.append({'name': 'Factual Content', 'status': 'pass',
-                        'description': 'Contains specific data, statistics, and factual information.'})
-        total_score += 15
-    elif fact_count >= 1:
-        factors.append({'name': 'Factual Content', 'status': 'pass',
-                        'description': 'Includes some verifiable facts and data.'})
-        total_score += 8
-    else:
-        factors.append({'name': 'Factual Content', 'status': 'warning',
-                        'description': 'Lacks specific facts, data, or statistics to support claims.'})
-        total_score -= 10
-
-    # 6. GRAMMAR & PROFESSIONALISM
-    grammar_issues = [r'!!!+', r'\?\?\?+', r'[A-Z]{6,}', r'\.\.\.\.\.']
-    grammar_issue_count = sum(1 for pattern in grammar_issues if re.search(pattern, text))
-
-    if grammar_issue_count >= 3:
-        factors.append({'name': 'Writing Professionalism', 'status': 'fail',
-                        'description': 'Multiple grammar/formatting issues suggest unprofessional or manipulative writing.'})
-        total_score -= 20
-    elif grammar_issue_count >= 1:
-        factors.append({'name': 'Writing Professionalism', 'status': 'warning',
-                        'description': 'Some unprofessional formatting detected (excessive punctuation/caps).'})
-        total_score -= 10
-    else:
-        factors.append({'name': 'Writing Professionalism', 'status': 'pass',
-                        'description': 'Professional writing style and formatting.'})
-        total_score += 10
-
-    # 7. BALANCED PERSPECTIVE
-    one_sided_indicators = [
-        r'\balways\b', r'\bnever\b', r'\beveryone\s+(knows|agrees)\b',
-        r'\bobviously\b', r'\bclearly\b.*\b(wrong|right)\b',
-        r'\bonly\s+idiots\b', r'\banyone\s+who\s+believes\b'
-    ]
-    balance_indicators = [
-        r'\bhowever\b', r'\bon\s+the\s+other\s+hand\b', r'\bwhile\b.*\balso\b',
-        r'\bsome\s+argue\b', r'\bcritics\s+say\b', r'\bdebate\b',
-        r'\bdifferent\s+perspectives\b'
-    ]
-    one_sided_count = sum(1 for pattern in one_sided_indicators if re.search(pattern, text_lower))
-    balanced_count = sum(1 for pattern in balance_indicators if re.search(pattern, text_lower))
-
-    if one_sided_count > balanced_count + 2:
-        factors.append({'name': 'Perspective Balance', 'status': 'fail',
-                        'description': 'Presents extremely one-sided view without acknowledging other perspectives.'})
-        total_score -= 20
-    elif balanced_count >= 2:
-        factors.append({'name': 'Perspective Balance', 'status': 'pass',
-                        'description': 'Presents multiple perspectives and balanced viewpoints.'})
-        total_score += 15
-    else:
-        factors.append({'name': 'Perspective Balance', 'status': 'warning',
-                        'description': 'May lack balanced representation of different viewpoints.'})
-        total_score -= 5
-
-    # 8. CONTENT LENGTH & DEPTH
-    word_count = len(text.split())
-    if word_count < 50:
-        factors.append({'name': 'Content Depth', 'status': 'warning',
-                        'description': f'Very short content ({word_count} words) may lack necessary context.'})
-        total_score -= 15
-    elif word_count < 150:
-        factors.append({'name': 'Content Depth', 'status': 'warning',
-                        'description': f'Short content ({word_count} words). May benefit from more detail.'})
-        total_score -= 5
-    else:
-        factors.append({'name': 'Content Depth', 'status': 'pass',
-                        'description': f'Adequate length ({word_count} words) for comprehensive coverage.'})
-        total_score += 5
-
-    credibility_score = max(0, min(100, total_score))
-
-    if credibility_score >= 65:
-        verdict = 'reliable'
-        summary = 'This content shows strong characteristics of reliable information with proper sourcing, balanced perspective, and factual content. However, always verify important claims from multiple sources.'
-    elif credibility_score >= 35:
-        verdict = 'questionable'
-        summary = 'This content has significant red flags that warrant caution. Multiple indicators suggest potential bias or misinformation. Cross-check facts with established news sources before sharing.'
-    else:
-        verdict = 'unreliable'
-        summary = 'This content exhibits numerous warning signs commonly found in misinformation, including clickbait, lack of sources, emotional manipulation, or conspiracy language. Exercise extreme caution and verify all claims independently.'
-
-    return {
-        'credibility_score': credibility_score,
-        'verdict': verdict,
-        'factors': factors,
-        'summary': summary
-    }
-
-
-def render_hero():
-    """Render hero section"""
-    st.markdown('<div class="centered"><div class="badge">✨ AI-Powered Verification Technology</div></div>', unsafe_allow_html=True)
-    st.markdown('<h1 class="hero-title">Fake News Detector</h1>', unsafe_allow_html=True)
-    st.markdown('<div class="section-divider" style="width: 150px; margin: 1rem auto;"></div>', unsafe_allow_html=True)
-    st.markdown(
-        '<p class="hero-subtitle">Analyze news articles and claims for credibility. Get instant insights on potential<br/>misinformation, bias, and reliability indicators using advanced AI technology.</p>',
-        unsafe_allow_html=True
-    )
+@st.cache_resource
+def page_style():
+    """The page's <style> block, read once per server process"""
+    with open(os.path.join(BASE_DIR, 'style.css'), encoding='utf-8') as f:
+        return f'<style>\n{f.read()}</style>'
 
-    st.markdown("""
+
+# Custom CSS for styling
+st.markdown(page_style(), unsafe_allow_html=True)
+
+
+def format_count(count):
+    """Abbreviate an article count for the stats cards"""
+    if count >= 1_000_000:
+        return f"{count / 1_000_000:.1f}M"
+    if count >= 10_000:
+        return f"{count // 1000}K"
+    return f"{count:,}"
+
+
+@st.cache_resource
+def hero_html():
+    """Static hero markup, built once per server process"""
+    return """
+        <div class="centered"><div class="badge">✨ AI-Powered Verification Technology</div></div>
+        <h1 class="hero-title">Fake News Detector</h1>
+        <div class="section-divider" style="width: 150px; margin: 1rem auto;"></div>
+        <p class="hero-subtitle">Analyze news articles and claims for credibility. Get instant insights on potential<br/>misinformation, bias, and reliability indicators using advanced AI technology.</p>
         <div class="feature-pills">
             <div class="feature-pill">⚡ Instant Analysis</div>
             <div class="feature-pill">🛡️ Multi-Factor Check</div>
             <div class="feature-pill">✨ Educational Insights</div>
         </div>
-    """, unsafe_allow_html=True)
+    """
 
-    st.markdown("""
+
+def render_hero(stats=None):
+    """Render hero section"""
+    st.markdown(hero_html(), unsafe_allow_html=True)
+
+    articles = format_count(stats["articles"]) if stats else "—"
+    st.markdown(f"""
         <div class="stats-container">
             <div class="stat-card">
                 <div>👥</div>
-                <div class="stat-value">10K+</div>
+                <div class="stat-value">{articles}</div>
                 <div class="stat-label">Articles Analyzed</div>
             </div>
             <div class="stat-card">
@@ -641,6 +101,11 @@ def render_analysis_form():
             key="text_area_input"  # ← unique key added
         )
         analyze_button = st.button("✨ Analyze Content", key="analyze_text", type="primary")
+        st.toggle(
+            "⚡ Live heuristic score",
+            key="live_score",
+            help="Rescore with the heuristics whenever the text changes (press Ctrl+Enter or click outside the box)"
+        )
 
         if analyze_button and text_input.strip():
             st.markdown('</div>', unsafe_allow_html=True)
@@ -657,15 +122,34 @@ def render_analysis_form():
         analyze_button_url = st.button("✨ Analyze Content", key="analyze_url", type="primary")
 
         if analyze_button_url and url_input.strip():
-            sample_text = f"According to recent reports, this article from {url_input} discusses important topics. The content appears to be well-sourced and provides balanced perspectives on the subject matter."
-            st.markdown('</div>', unsafe_allow_html=True)
-            return sample_text, True
+            # requests and newspaper3k are only imported once a URL is analyzed
+            from fetch import FetchError, fetch_article
+            try:
+                with st.spinner('🌐 Fetching article...'):
+                    article = fetch_article(url_input.strip())
+            except FetchError as exc:
+                st.error(f"⚠️ {exc}")
+            else:
+                st.markdown('</div>', unsafe_allow_html=True)
+                return article['text'], True
 
     st.markdown('</div>', unsafe_allow_html=True)
     return None, False
 
 
-def render_results(result):
+def render_live_score(text):
+    """Render the heuristic result of the text being edited, rescanning only changed sentences"""
+    from analysis import LiveAnalysis
+
+    live = st.session_state.setdefault('live_analysis', LiveAnalysis())
+    started = time.perf_counter()
+    result = live.analyze(text)
+    latency_ms = (time.perf_counter() - started) * 1000
+    record('app.live', latency_ms / 1000)
+    render_results(result, latency_ms)
+
+
+def render_results(result, latency_ms=None, cache_hit=False):
     """Render analysis results"""
     verdict = result['verdict']
     score = result['credibility_score']
@@ -686,6 +170,8 @@ def render_results(result):
                 <div style="font-size: 0.875rem; color: #94a3b8;">Score</div>
             </div>
         """, unsafe_allow_html=True)
+        if latency_ms is not None:
+            st.markdown(f'<p style="text-align: center; color: #64748b; font-size: 0.75rem; margin-top: 0.75rem;">⏱️ Analyzed in {latency_ms:.1f} ms{" (cached)" if cache_hit else ""}</p>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     with col2:
@@ -737,16 +223,32 @@ def render_results(result):
             </div>
         """, unsafe_allow_html=True)
 
+    if result.get('top_features'):
+        render_top_features(result['top_features'])
+
     st.markdown('</div>', unsafe_allow_html=True)
 
 
-def render_tips():
-    """Render tips section"""
-    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
-    st.markdown('<div class="centered"><div class="badge">💡 Expert Tips</div></div>', unsafe_allow_html=True)
-    st.markdown('<h2 class="section-title">How to Spot Fake News</h2>', unsafe_allow_html=True)
-    st.markdown('<p class="section-subtitle">Tips and strategies for identifying misinformation</p>', unsafe_allow_html=True)
+def render_top_features(top_features):
+    """Render the tokens that most influenced the trained model"""
+    pills = ''.join(
+        f'<div class="feature-pill" style="border-color: {"#22c55e" if feature["weight"] > 0 else "#ef4444"}80;">'
+        f'{"↑" if feature["weight"] > 0 else "↓"} {feature["term"]} '
+        f'<span style="color: #64748b;">{feature["weight"]:+.3f}</span></div>'
+        for feature in top_features
+    )
+    st.markdown(f"""
+        <div class="factor-card">
+            <div class="factor-title">Most Influential Words</div>
+            <div class="factor-description">Words from this article weighted by the model: ↑ green pushes towards real news, ↓ red towards fake news.</div>
+            <div class="feature-pills" style="justify-content: flex-start; gap: 0.5rem; margin: 1rem 0 0;">{pills}</div>
+        </div>
+    """, unsafe_allow_html=True)
+
 
+@st.cache_resource
+def tips_html():
+    """Static tips markup, built once per server process"""
     tips = [
         {
             'icon': '🛡️',
@@ -774,24 +276,34 @@ def render_tips():
         }
     ]
 
-    cols = st.columns(2)
-    for idx, tip in enumerate(tips):
-        with cols[idx % 2]:
-            st.markdown(f"""
-                <div class="tip-card">
-                    <div class="tip-icon" style="background: {tip['gradient']};">
-                        {tip['icon']}
-                    </div>
-                    <div class="tip-title">{tip['title']}</div>
-                    <div class="tip-description">{tip['description']}</div>
+    cards = ''.join(f"""
+            <div class="tip-card">
+                <div class="tip-icon" style="background: {tip['gradient']};">
+                    {tip['icon']}
                 </div>
-            """, unsafe_allow_html=True)
+                <div class="tip-title">{tip['title']}</div>
+                <div class="tip-description">{tip['description']}</div>
+            </div>""" for tip in tips)
+    return f"""
+        <div class="section-divider"></div>
+        <div class="centered"><div class="badge">💡 Expert Tips</div></div>
+        <h2 class="section-title">How to Spot Fake News</h2>
+        <p class="section-subtitle">Tips and strategies for identifying misinformation</p>
+        <div class="tips-grid">{cards}
+        </div>
+    """
 
 
-def render_footer():
-    """Render footer"""
-    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
-    st.markdown("""
+def render_tips():
+    """Render tips section"""
+    st.markdown(tips_html(), unsafe_allow_html=True)
+
+
+@st.cache_resource
+def footer_html():
+    """Static footer markup, built once per server process"""
+    return """
+        <div class="section-divider"></div>
         <div style="text-align: center; padding: 2rem 0; color: #64748b;">
             <div style="display: flex; align-items: center; justify-content: center; gap: 0.5rem; margin-bottom: 1rem;">
                 <span style="font-size: 1.5rem;">🛡️</span>
@@ -805,26 +317,93 @@ def render_footer():
                 <p style="font-size: 0.875rem;">© 2025 Fake News Detector. Built for educational purposes.</p>
             </div>
         </div>
-    """, unsafe_allow_html=True)
+    """
+
+
+def render_footer():
+    """Render footer"""
+    st.markdown(footer_html(), unsafe_allow_html=True)
+
+
+@st.cache_resource(show_spinner="Starting analysis workers...")
+def get_pool():
+    """Process pool shared by every session of this server"""
+    return AnalysisPool.from_env()
+
+
+@st.cache_resource
+def get_store():
+    """Result history shared by every session, or None when FAKE_NEWS_STORE is empty"""
+    return ResultStore(STORE_PATH) if STORE_PATH else None
+
+
+@st.cache_resource
+def start_metrics():
+    """Serve /metrics on FAKE_NEWS_METRICS_PORT, once per server process"""
+    port = os.environ.get('FAKE_NEWS_METRICS_PORT')
+    return start_metrics_server(int(port)) if port else None
+
+
+@st.fragment
+def render_analysis_section(store, tracing=False):
+    """Render mode picker, form and results; their widgets rerun only this fragment"""
+    mode = st.radio(
+        "Analysis Mode",
+        [HEURISTIC_MODE, MODEL_MODE, HYBRID_MODE],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="analysis_mode"
+    )
+    text, should_analyze = render_analysis_form()
+
+    if should_analyze and text:
+        with collect_trace() if tracing else nullcontext() as trace:
+            with st.spinner('🔍 Analyzing content for credibility...'):
+                started = time.perf_counter()
+                kind = ANALYSIS_KINDS[mode]
+                version = None
+                if kind != 'model':
+                    # Results reached under earlier rules must not be served
+                    from rules import registry
+                    version = registry.current().version
+                try:
+                    result, cache_hit = cached_analysis(kind, text, lambda article: get_pool().analyze(kind, article),
+                                                        version=version, top_k=RESULT_TOP_K[kind])
+                except PoolBusy:
+                    result = None
+                latency_ms = (time.perf_counter() - started) * 1000
+                record('app.analyze', latency_ms / 1000)
+
+            if result is None:
+                st.warning('⏳ The server is busy analyzing other articles. Please try again in a moment.')
+            else:
+                if store:
+                    store.record(kind, text, result)
+                st.markdown('<div id="results"></div>', unsafe_allow_html=True)
+                with timed('app.render'):
+                    render_results(result, latency_ms, cache_hit)
+
+        if tracing:
+            with st.expander('⏱️ Stage timings (ms)'):
+                st.json(trace)
+    elif st.session_state.get('live_score') and st.session_state.get('text_area_input', '').strip():
+        render_live_score(st.session_state['text_area_input'])
 
 
 # Main App
 def main():
-    render_hero()
+    # Creating the pool starts warming up its workers while the user types
+    get_pool()
+    store = get_store()
+    render_hero(store.stats() if store else None)
 
     st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
     st.markdown('<h2 class="section-title">Start Your Analysis</h2>', unsafe_allow_html=True)
     st.markdown('<p class="section-subtitle">Simply paste your content or enter a URL to begin</p>', unsafe_allow_html=True)
 
-    text, should_analyze = render_analysis_form()
-
-    if should_analyze and text:
-        with st.spinner('🔍 Analyzing content for credibility...'):
-            time.sleep(1.5)
-            result = advanced_fake_news_analysis(text)
-
-        st.markdown('<div id="results"></div>', unsafe_allow_html=True)
-        render_results(result)
+    start_metrics()
+    # Opt in to a per-stage timing breakdown with ?trace=1
+    render_analysis_section(store, tracing=st.query_params.get('trace') == '1')
 
     render_tips()
     render_footer()
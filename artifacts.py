@@ -0,0 +1,416 @@
+"""
+Compact, memory-mapped model artifacts.
+
+    python artifacts.py export --out model_compact
+    python artifacts.py benchmark --dir model_compact
+    python artifacts.py prune --out model_pruned --threshold 0.1
+
+``export`` converts vectorizer.jb and lr_model.jb into a directory of raw
+arrays: the vocabulary as a sorted UTF-8 string table plus a sorted table of
+64-bit term hashes for lookups, and the idf and coefficient vectors as
+float64 arrays. Loading maps the files read-only instead of unpickling a
+large dict of Python strings, so it is fast and every worker process shares
+the same pages. Set FAKE_NEWS_MODEL_DIR to the directory to make
+inference.load_model use it.
+
+``benchmark`` measures cold-start load time and per-process memory of both
+formats in fresh interpreters.
+
+``prune`` exports a smaller model: terms whose weight on the decision,
+``|coef * idf|``, is below a threshold are dropped from the vocabulary, the
+rest are re-indexed and idf and coef are stored as float32. It then scores
+the notebook's test split with both models and reports the accuracy change,
+failing if it exceeds ``--max-drop``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+def term_hashes(terms):
+    """
+    Return stable 128-bit hashes of terms as an ``(n, 2)`` uint64 array,
+    identical in every process. The first column is the lookup key and the
+    second a check value, so an unknown token is only ever mistaken for a
+    term if both collide.
+    """
+    digests = b''.join(hashlib.blake2b(term.encode('utf-8'), digest_size=16).digest() for term in terms)
+    return np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+
+
+def _check_supported(vectorizer):
+    """
+    Raise ValueError for vectorizer settings the compact transform does not implement
+    """
+    unsupported = {
+        'analyzer': 'word', 'ngram_range': (1, 1), 'preprocessor': None, 'tokenizer': None,
+        'stop_words': None, 'strip_accents': None, 'binary': False, 'use_idf': True
+    }
+    params = vectorizer.get_params()
+    for name, expected in unsupported.items():
+        if params.get(name) != expected:
+            raise ValueError(f'Compact export does not support {name}={params.get(name)!r}')
+    if params.get('norm') not in ('l1', 'l2', None):
+        raise ValueError(f"Compact export does not support norm={params.get('norm')!r}")
+
+
+def feature_importance(vectorizer, classifier):
+    """
+    Return each feature's largest possible weight on the decision, ``|coef * idf|``
+    """
+    return np.abs(np.asarray(classifier.coef_, dtype=np.float64).ravel() * vectorizer.idf_)
+
+
+def prune_features(vectorizer, classifier, threshold):
+    """
+    Return the sorted indices of the features whose importance reaches ``threshold``
+    """
+    return np.flatnonzero(feature_importance(vectorizer, classifier) >= threshold)
+
+
+def export_model(vectorizer, classifier, directory, keep=None, dtype=np.float64):
+    """
+    Write a fitted TfidfVectorizer and binary linear classifier as compact arrays.
+
+    ``keep`` restricts the vocabulary to those feature indices, re-indexed in
+    order, and ``dtype`` sets the precision of the idf and coef vectors.
+    """
+    _check_supported(vectorizer)
+    if len(classifier.classes_) != 2:
+        raise ValueError('Compact export only supports binary classifiers')
+    os.makedirs(directory, exist_ok=True)
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    idf = np.asarray(vectorizer.idf_)
+    coef = np.asarray(classifier.coef_).ravel()
+    if keep is not None:
+        terms = [terms[index] for index in keep.tolist()]
+        idf = idf[keep]
+        coef = coef[keep]
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(term) for term in encoded])
+    hashes = term_hashes(terms)
+    order = np.argsort(hashes[:, 0], kind='stable')
+    if len(np.unique(hashes[:, 0])) != len(terms):
+        raise ValueError('Term hash collision, cannot build the lookup table')
+
+    with open(os.path.join(directory, 'terms.bin'), 'wb') as handle:
+        handle.write(b''.join(encoded))
+    np.save(os.path.join(directory, 'term_offsets.npy'), offsets)
+    np.save(os.path.join(directory, 'term_hashes.npy'), np.ascontiguousarray(hashes[order, 0]))
+    np.save(os.path.join(directory, 'term_checks.npy'), np.ascontiguousarray(hashes[order, 1]))
+    np.save(os.path.join(directory, 'hash_index.npy'), order.astype(np.int32))
+    np.save(os.path.join(directory, 'idf.npy'), idf.astype(dtype))
+    np.save(os.path.join(directory, 'coef.npy'), coef.astype(dtype))
+
+    params = vectorizer.get_params()
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'n_features': len(terms),
+        'source_features': len(vectorizer.vocabulary_),
+        'lowercase': params['lowercase'],
+        'token_pattern': params['token_pattern'],
+        'norm': params['norm'],
+        'sublinear_tf': params['sublinear_tf'],
+        'intercept': float(np.ravel(classifier.intercept_)[0]),
+        'classes': [int(label) for label in classifier.classes_]
+    }
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as handle:
+        json.dump(meta, handle, indent=2)
+
+
+class CompactVectorizer:
+    """
+    Memory-mapped stand-in for the fitted TfidfVectorizer's transform
+    """
+
+    def __init__(self, directory, meta):
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode='r')
+
+        self.lowercase = meta['lowercase']
+        self.norm = meta['norm']
+        self.sublinear_tf = meta['sublinear_tf']
+        self.idf_ = load('idf.npy')
+        self._token_pattern = re.compile(meta['token_pattern'])
+        terms_path = os.path.join(directory, 'terms.bin')
+        if os.path.getsize(terms_path):
+            self._terms = np.memmap(terms_path, dtype=np.uint8, mode='r')
+        else:
+            # numpy cannot map an empty file
+            self._terms = np.zeros(0, dtype=np.uint8)
+        self._offsets = load('term_offsets.npy')
+        self._hashes = load('term_hashes.npy')
+        self._checks = load('term_checks.npy')
+        self._hash_index = load('hash_index.npy')
+
+    def __len__(self):
+        return len(self.idf_)
+
+    def term(self, index):
+        """
+        Return the vocabulary term at a feature index
+        """
+        return self._terms[self._offsets[index]:self._offsets[index + 1]].tobytes().decode('utf-8')
+
+    def lookup(self, tokens):
+        """
+        Return the feature index of each token, or -1 for unknown tokens
+        """
+        if not tokens or not len(self._hashes):
+            return np.full(len(tokens), -1, dtype=np.int64)
+        hashes = term_hashes(tokens)
+        positions = np.minimum(np.searchsorted(self._hashes, hashes[:, 0]), len(self._hashes) - 1)
+        found = (self._hashes[positions] == hashes[:, 0]) & (self._checks[positions] == hashes[:, 1])
+        return np.where(found, self._hash_index[positions], -1).astype(np.int64)
+
+    def transform(self, texts):
+        """
+        Return the TF-IDF matrix TfidfVectorizer.transform would produce
+        """
+        documents = []
+        for text in texts:
+            if self.lowercase:
+                text = text.lower()
+            documents.append(Counter(self._token_pattern.findall(text)))
+
+        # One vectorized lookup for every distinct token in the batch
+        tokens = list(set().union(*documents))
+        features = dict(zip(tokens, self.lookup(tokens).tolist()))
+
+        indptr = np.zeros(len(documents) + 1, dtype=np.int64)
+        indices = []
+        frequencies = []
+        for row, counts in enumerate(documents):
+            known = [(features[token], count) for token, count in counts.items() if features[token] >= 0]
+            known.sort()
+            indices.extend(index for index, _ in known)
+            frequencies.extend(count for _, count in known)
+            indptr[row + 1] = len(indices)
+
+        indices = np.array(indices, dtype=np.int64)
+        values = np.array(frequencies, dtype=np.float64)
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        values *= self.idf_[indices]
+        if self.norm is not None:
+            row_ids = np.repeat(np.arange(len(documents)), np.diff(indptr))
+            magnitudes = values * values if self.norm == 'l2' else np.abs(values)
+            totals = np.bincount(row_ids, weights=magnitudes, minlength=len(documents))
+            if self.norm == 'l2':
+                totals = np.sqrt(totals)
+            totals[totals == 0] = 1.0
+            values /= totals[row_ids]
+        return sp.csr_matrix((values, indices, indptr), shape=(len(documents), len(self)))
+
+
+class CompactClassifier:
+    """
+    Memory-mapped binary linear classifier with predict_proba
+    """
+
+    def __init__(self, directory, meta):
+        self.coef_ = np.load(os.path.join(directory, 'coef.npy'), mmap_mode='r').reshape(1, -1)
+        self.intercept_ = np.array([meta['intercept']])
+        self.classes_ = np.array(meta['classes'])
+
+    def decision_function(self, features):
+        return features @ self.coef_[0] + self.intercept_[0]
+
+    def predict_proba(self, features):
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(features)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, features):
+        return self.classes_[(self.decision_function(features) > 0).astype(int)]
+
+
+def load_compact_model(directory):
+    """
+    Map an exported model directory, returning ``(vectorizer, classifier)``
+    """
+    with open(os.path.join(directory, META_FILE), encoding='utf-8') as handle:
+        meta = json.load(handle)
+    if meta['format_version'] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact model format {meta['format_version']}")
+    return CompactVectorizer(directory, meta), CompactClassifier(directory, meta)
+
+
+def notebook_test_split(fake_path, true_path, test_size=0.25, seed=42):
+    """
+    Return the cleaned ``(texts, labels)`` test split of the notebook, which
+    labels Fake.csv 0 and True.csv 1 and holds out a quarter with seed 42
+    """
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from preprocessing import clean_texts
+
+    fake = pd.read_csv(fake_path, usecols=['text'])
+    true = pd.read_csv(true_path, usecols=['text'])
+    fake['class'] = 0
+    true['class'] = 1
+    data = pd.concat([fake, true], axis=0).reset_index(drop=True)
+    texts = clean_texts(data['text'])
+    _, test_texts, _, test_labels = train_test_split(texts, data['class'], test_size=test_size, random_state=seed)
+    return test_texts.tolist(), test_labels.to_numpy()
+
+
+def evaluate_models(models, texts, labels):
+    """
+    Score the same texts with each named ``(vectorizer, classifier)`` pair and
+    report its accuracy and transform and predict_proba times
+    """
+    report = {}
+    for name, (vectorizer, classifier) in models.items():
+        started = time.perf_counter()
+        features = vectorizer.transform(texts)
+        transformed = time.perf_counter()
+        probabilities = classifier.predict_proba(features)
+        predicted = time.perf_counter()
+        labels_predicted = np.asarray(classifier.classes_)[probabilities.argmax(axis=1)]
+        report[name] = {
+            'accuracy': round(float(np.mean(labels_predicted == labels)), 5),
+            'transform_seconds': round(transformed - started, 4),
+            'predict_proba_seconds': round(predicted - transformed, 4)
+        }
+    return report
+
+
+def _size(*paths):
+    """
+    Return the total size in bytes of files and directories
+    """
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        else:
+            total += os.path.getsize(path)
+    return total
+
+
+def prune(vectorizer_path, model_path, directory, threshold, fake_path, true_path):
+    """
+    Export a pruned float32 model and compare it with the joblib model on the
+    notebook's test split
+    """
+    import joblib
+
+    vectorizer, classifier = joblib.load(vectorizer_path), joblib.load(model_path)
+    keep = prune_features(vectorizer, classifier, threshold)
+    export_model(vectorizer, classifier, directory, keep=keep, dtype=np.float32)
+    print(f'Kept {len(keep)} of {len(vectorizer.vocabulary_)} features, wrote {directory}', file=sys.stderr)
+
+    texts, labels = notebook_test_split(fake_path, true_path)
+    report = evaluate_models({'full': (vectorizer, classifier), 'pruned': load_compact_model(directory)},
+                             texts, labels)
+    report['full'].update(features=len(vectorizer.vocabulary_), bytes=_size(vectorizer_path, model_path))
+    report['pruned'].update(features=len(keep), bytes=_size(directory))
+    report['threshold'] = threshold
+    report['test_articles'] = len(labels)
+    report['accuracy_delta'] = round(report['pruned']['accuracy'] - report['full']['accuracy'], 5)
+    return report
+
+
+_BENCHMARK_SNIPPET = '''
+import json, sys, time
+started = time.perf_counter()
+{load}
+loaded = time.perf_counter()
+vectorizer.transform(["warm up the vocabulary lookup"])
+first = time.perf_counter()
+memory = {{}}
+try:
+    with open('/proc/self/smaps_rollup') as handle:
+        for line in handle:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                memory[name] = int(value.split()[0]) / 1024
+except OSError:
+    import resource
+    memory['Rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{
+    'load_seconds': round(loaded - started, 4),
+    'first_transform_seconds': round(first - loaded, 4),
+    'rss_mb': round(memory.get('Rss', 0), 1),
+    'private_mb': round(memory.get('Private_Clean', 0) + memory.get('Private_Dirty', 0), 1),
+}}))
+'''
+
+
+def benchmark(directory, vectorizer_path, model_path, repeat=3):
+    """
+    Time cold loads of both formats in fresh interpreters and report memory
+    """
+    loaders = {
+        'joblib': f'import joblib\nvectorizer = joblib.load({vectorizer_path!r})\nclassifier = joblib.load({model_path!r})',
+        'compact': f'from artifacts import load_compact_model\nvectorizer, classifier = load_compact_model({directory!r})'
+    }
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, load in loaders.items():
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-W', 'ignore', '-c', _BENCHMARK_SNIPPET.format(load=load)],
+                cwd=here, capture_output=True, text=True, check=True
+            ).stdout
+            runs.append(json.loads(output))
+        results[name] = {key: min(run[key] for run in runs) for key in runs[0]}
+    return results
+
+
+def main(argv=None):
+    from inference import MODEL_PATH, VECTORIZER_PATH
+
+    parser = argparse.ArgumentParser(description='Export, prune or benchmark compact model artifacts.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='convert the joblib artifacts')
+    export.add_argument('--out', default='model_compact', help='directory to write')
+    bench = commands.add_parser('benchmark', help='compare cold-start load time and memory')
+    bench.add_argument('--dir', default='model_compact', help='exported directory')
+    bench.add_argument('--repeat', type=int, default=3)
+    pruned = commands.add_parser('prune', help='export without low-weight terms, in float32')
+    pruned.add_argument('--out', default='model_pruned', help='directory to write')
+    pruned.add_argument('--threshold', type=float, default=0.1,
+                        help='drop terms whose |coef * idf| is below this')
+    pruned.add_argument('--fake', default='Fake.csv', help='CSV of fake articles for the notebook test split')
+    pruned.add_argument('--true', default='True.csv', help='CSV of real articles for the notebook test split')
+    pruned.add_argument('--max-drop', type=float, default=0.001,
+                        help='fail if test accuracy falls by more than this')
+    for command in (export, bench, pruned):
+        command.add_argument('--vectorizer', default=VECTORIZER_PATH)
+        command.add_argument('--model', default=MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        import joblib
+        export_model(joblib.load(args.vectorizer), joblib.load(args.model), args.out)
+        print(f'Wrote {args.out}', file=sys.stderr)
+    elif args.command == 'prune':
+        report = prune(args.vectorizer, args.model, args.out, args.threshold, args.fake, args.true)
+        print(json.dumps(report, indent=2))
+        if -report['accuracy_delta'] > args.max_drop:
+            print(f"Accuracy fell by {-report['accuracy_delta']:.5f}, more than --max-drop {args.max_drop}",
+                  file=sys.stderr)
+            sys.exit(1)
+    else:
+        print(json.dumps(benchmark(os.path.abspath(args.dir), os.path.abspath(args.vectorizer),
+                                   os.path.abspath(args.model), args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Score a JSONL feed of articles in batches and stream the results as JSONL.
+
+    python batch.py articles.jsonl -o results.jsonl --batch-size 1000
+
+Each input line is a JSON object holding the article text (``text`` by
+default). With ``--urls`` each line is an article URL instead; pages are
+fetched concurrently and failures are written as ``{"id", "error"}`` lines.
+Use ``-`` to read from stdin or write to stdout.
+
+With ``--dedupe-index PATH`` articles that nearly duplicate one scored in an
+earlier run reuse its verdict (see neardup.py); the index is saved back to
+PATH when the run ends.
+"""
+import argparse
+import json
+import os
+import sys
+from itertools import islice
+
+from cache import result_cache
+from fetch import MAX_WORKERS, fetch_articles
+from inference import CONFIDENT_PROBABILITY, MODEL_WEIGHT, analyze_batch, load_model
+from neardup import NearDuplicateIndex, analyze_with_index
+
+
+def read_articles(lines, text_field='text', id_field='id'):
+    """
+    Yield ``(article_id, text)`` pairs from JSONL lines, skipping blank lines
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        yield record.get(id_field, line_number), record[text_field]
+
+
+def read_urls(lines, output, max_workers=MAX_WORKERS):
+    """
+    Fetch the URL on each line concurrently and yield ``(url, text)`` pairs,
+    writing an error line to ``output`` for pages that cannot be fetched
+    """
+    urls = (line.strip() for line in lines if line.strip())
+    for url, article, error in fetch_articles(urls, max_workers=max_workers):
+        if error is None:
+            yield url, article['text']
+        else:
+            output.write(json.dumps({'id': url, 'error': error}) + '\n')
+
+
+def score_stream(articles, output, batch_size=1000, heuristics=True, top_k=0, index=None, **options):
+    """
+    Score ``(article_id, text)`` pairs batch by batch, writing one JSON line
+    per article to ``output``. Returns the number of articles scored. Extra
+    keyword ``options`` are passed through to analyze_batch. With a
+    NearDuplicateIndex as ``index``, near duplicates of indexed articles
+    reuse their verdict and every scored article is added to it.
+    """
+    model = load_model()
+    articles = iter(articles)
+    scored = 0
+    while True:
+        batch = list(islice(articles, batch_size))
+        if not batch:
+            return scored
+        ids, texts = zip(*batch)
+        if index is None:
+            results = analyze_batch(texts, model, heuristics, top_k=top_k, **options)
+        else:
+            results = analyze_with_index(ids, texts, index, lambda pending: analyze_batch(
+                pending, model, heuristics, top_k=top_k, **options))
+        for article_id, result in zip(ids, results):
+            output.write(json.dumps({'id': article_id, **result}) + '\n')
+        output.flush()
+        scored += len(batch)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a JSONL feed of news articles.')
+    parser.add_argument('input', help='JSONL file of articles, or - for stdin')
+    parser.add_argument('-o', '--output', default='-', help='JSONL file for results, or - for stdout')
+    parser.add_argument('--batch-size', type=int, default=1000, help='articles vectorized per model call')
+    parser.add_argument('--text-field', default='text', help='JSON field holding the article text')
+    parser.add_argument('--id-field', default='id', help='JSON field identifying the article')
+    parser.add_argument('--model-only', action='store_true', help='skip the heuristic factors')
+    parser.add_argument('--hybrid', action='store_true',
+                        help='blend model and heuristics, skipping heuristics when the model is confident')
+    parser.add_argument('--model-weight', type=float, default=MODEL_WEIGHT, help='model share of the hybrid score')
+    parser.add_argument('--confidence', type=float, default=CONFIDENT_PROBABILITY,
+                        help='model probability at which the hybrid skips the heuristics')
+    parser.add_argument('--top-features', type=int, default=0, metavar='K',
+                        help='add the K tokens that most influenced the model')
+    parser.add_argument('--urls', action='store_true', help='input lines are article URLs to fetch')
+    parser.add_argument('--fetch-workers', type=int, default=MAX_WORKERS, help='concurrent downloads with --urls')
+    parser.add_argument('--dedupe-index', metavar='PATH',
+                        help='near-duplicate index to reuse verdicts from, updated after the run')
+    args = parser.parse_args(argv)
+
+    index = None
+    if args.dedupe_index:
+        index = NearDuplicateIndex.load(args.dedupe_index) if os.path.exists(args.dedupe_index) else NearDuplicateIndex()
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        if args.urls:
+            articles = read_urls(source, sink, args.fetch_workers)
+        else:
+            articles = read_articles(source, args.text_field, args.id_field)
+        scored = score_stream(articles, sink, args.batch_size, not args.model_only, args.top_features,
+                              hybrid=args.hybrid, model_weight=args.model_weight,
+                              confidence=args.confidence, index=index)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        if index is not None:
+            index.save(args.dedupe_index)
+    stats = result_cache.stats()
+    print(f'Scored {scored} articles (cache hits: {stats["hits"]}, misses: {stats["misses"]})', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
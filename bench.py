@@ -0,0 +1,361 @@
+"""
+Reproducible benchmarks for analysis, preprocessing, model loading,
+inference, the UI and cold start.
+
+    python bench.py --out bench.json
+    python bench.py --only analysis,clean --quick --compare bench.json
+
+Articles come from a seeded generator with controllable length and density
+of heuristic trigger phrases, so two runs with the same seed time the same
+inputs. Results are written as JSON; ``--compare`` reports every timing that
+got slower than a baseline file by more than ``--tolerance`` and exits with
+status 1 if any did.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NEUTRAL_WORDS = (
+    'the government announced on tuesday that officials will review the budget proposal '
+    'after lawmakers met with representatives from several states to discuss funding for '
+    'schools roads and hospitals while the committee said a final vote is expected next week '
+    'and the report includes figures from the department of labor and local agencies'
+).split()
+
+TRIGGER_PHRASES = [
+    "you won't believe", 'shocking', 'miracle', 'secret plan revealed', 'exposed',
+    "they don't want you to know", 'cover-up', 'deep state', 'wake up sheeple',
+    'according to reuters', 'associated press', 'university of chicago', 'study published',
+    'sources say', 'experts claim', 'studies show', 'outrageous', 'furious', 'devastating',
+    '45% of voters', '12 million people', 'march 3, 2020', 'data shows', 'always', 'never',
+    'everyone knows', 'obviously', 'however', 'on the other hand', 'critics say', 'debate',
+    'BREAKING!!!', 'what???', 'UNBELIEVABLE', '.....',
+]
+
+SENTENCE_ENDS = ['.', '.', '.', '!', '?']
+
+
+def generate_article(words, density=0.05, rng=None):
+    """
+    Return a synthetic article of about ``words`` words in which roughly a
+    ``density`` fraction of the words start a heuristic trigger phrase
+    """
+    rng = rng or random.Random(0)
+    tokens = []
+    sentence_length = 0
+    while len(tokens) < words:
+        if rng.random() < density:
+            tokens.append(rng.choice(TRIGGER_PHRASES))
+        else:
+            tokens.append(rng.choice(NEUTRAL_WORDS))
+        sentence_length += 1
+        if sentence_length >= rng.randint(8, 25):
+            tokens[-1] += rng.choice(SENTENCE_ENDS)
+            sentence_length = 0
+    return ' '.join(tokens)
+
+
+def generate_articles(count, words, density=0.05, seed=0):
+    """
+    Return ``count`` reproducible synthetic articles
+    """
+    rng = random.Random(seed)
+    return [generate_article(words, density, rng) for _ in range(count)]
+
+
+def measure(function, repeat=5, number=1):
+    """
+    Time ``number`` calls of ``function`` ``repeat`` times and summarize the
+    per-call seconds
+    """
+    function()  # warm up caches and lazy initialization
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        runs.append((time.perf_counter() - started) / number)
+    return {'min_s': min(runs), 'median_s': statistics.median(runs), 'mean_s': statistics.fmean(runs)}
+
+
+def bench_analysis(sizes, densities, repeat, seed):
+    """
+    advanced_fake_news_analysis latency and throughput by article size and
+    trigger density
+    """
+    from analysis import advanced_fake_news_analysis
+
+    results = {}
+    for density in densities:
+        for words in sizes:
+            article = generate_article(words, density, random.Random(seed))
+            timing = measure(lambda: advanced_fake_news_analysis(article), repeat, max(1, 20000 // words))
+            timing['mb_per_s'] = len(article.encode('utf-8')) / timing['median_s'] / 1e6
+            results[f'words={words},density={density}'] = timing
+    return results
+
+
+def bench_clean(count, words, repeat, seed):
+    """
+    clean_text per row against clean_texts over the whole batch
+    """
+    from preprocessing import clean_text, clean_texts
+
+    articles = generate_articles(count, words, seed=seed)
+    size_mb = sum(len(article.encode('utf-8')) for article in articles) / 1e6
+    results = {
+        'clean_text_loop': measure(lambda: [clean_text(article) for article in articles], repeat),
+        'clean_texts_batch': measure(lambda: clean_texts(articles), repeat),
+    }
+    for timing in results.values():
+        timing['mb_per_s'] = size_mb / timing['median_s']
+    return results
+
+
+_LOAD_SNIPPET = '''
+import json, time
+import joblib
+timings = {{}}
+for name, path in (('vectorizer', {vectorizer!r}), ('model', {model!r})):
+    started = time.perf_counter()
+    joblib.load(path)
+    timings[name] = time.perf_counter() - started
+print(json.dumps(timings))
+'''
+
+
+def bench_model_load(repeat):
+    """
+    Cold joblib load times of vectorizer.jb and lr_model.jb, each run in a
+    fresh interpreter
+    """
+    from inference import MODEL_PATH, VECTORIZER_PATH
+
+    snippet = _LOAD_SNIPPET.format(vectorizer=VECTORIZER_PATH, model=MODEL_PATH)
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-W', 'ignore', '-c', snippet],
+                                cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output))
+    return {name: {'min_s': min(run[name] for run in runs),
+                   'median_s': statistics.median(run[name] for run in runs)}
+            for name in runs[0]}
+
+
+def bench_predict(count, words, repeat, seed):
+    """
+    predict_proba one article at a time against one batched call
+    """
+    from inference import load_model, predict_proba, predict_proba_batch
+
+    model = load_model()
+    articles = generate_articles(count, words, seed=seed)
+    results = {
+        'single': measure(lambda: [predict_proba(article, model) for article in articles], repeat),
+        'batched': measure(lambda: predict_proba_batch(articles, model), repeat),
+    }
+    for timing in results.values():
+        timing['articles_per_s'] = count / timing['median_s']
+    return results
+
+
+def bench_app(repeat, words, seed):
+    """
+    End-to-end latency of analyzing pasted text through the Streamlit script,
+    per analysis mode
+    """
+    from streamlit.testing.v1 import AppTest
+
+    import store
+    from cache import result_cache
+
+    script = os.path.join(BASE_DIR, 'app.py')
+    # The app runs in this process; keep the synthetic articles out of the
+    # real result history
+    store_path, store.STORE_PATH = store.STORE_PATH, ''
+    try:
+        modes = AppTest.from_file(script, default_timeout=120).run().radio(key='analysis_mode').options
+        results = {}
+        for mode in modes:
+            runs = []
+            for run in range(repeat + 1):
+                result_cache.clear()
+                session = AppTest.from_file(script, default_timeout=120).run()
+                session.radio(key='analysis_mode').set_value(mode).run()
+                session.text_area(key='text_area_input').input(
+                    generate_article(words, rng=random.Random(seed + run))).run()
+                started = time.perf_counter()
+                session.button(key='analyze_text').click().run()
+                if session.exception:
+                    raise RuntimeError(session.exception[0].message)
+                runs.append(time.perf_counter() - started)
+            # The first run also pays for loading the model if nothing has yet
+            results[mode] = {'first_s': runs[0], 'min_s': min(runs[1:]), 'median_s': statistics.median(runs[1:])}
+    finally:
+        store.STORE_PATH = store_path
+    return results
+
+
+_IMPORT_SNIPPET = '''
+import json, time
+timings = {}
+for name, statement in (('import_streamlit', 'import streamlit'),
+                        ('import_app_modules', 'import cache, metrics, pool, store'),
+                        ('import_inference', 'import inference'),
+                        ('load_model', 'inference.load_model()')):
+    started = time.perf_counter()
+    exec(statement)
+    timings[name] = time.perf_counter() - started
+print(json.dumps(timings))
+'''
+
+_FIRST_RESULT_SNIPPET = '''
+import json, threading, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+session = AppTest.from_file({script!r}, default_timeout=300).run()
+first_page = time.perf_counter() - started
+for thread in threading.enumerate():
+    if thread.name == 'analysis-warm-up':
+        thread.join()
+ready = time.perf_counter() - started
+radio = session.radio(key='analysis_mode')
+radio.set_value(radio.options[-1]).run()
+session.text_area(key='text_area_input').input({text!r}).run()
+clicked = time.perf_counter()
+session.button(key='analyze_text').click().run()
+if session.exception:
+    raise RuntimeError(session.exception[0].message)
+print(json.dumps({{'first_page': first_page, 'ready': ready, 'first_result': time.perf_counter() - clicked}}))
+'''
+
+
+def bench_startup(repeat, words, seed):
+    """
+    Cold start of a replica, each run in a fresh interpreter: import times,
+    model load, and the first page and first (hybrid) result through the
+    Streamlit script with and without the background warm-up
+    """
+    script = os.path.join(BASE_DIR, 'app.py')
+    runs = {}
+
+    def collect(prefix, snippet, **environment):
+        env = {**os.environ, 'FAKE_NEWS_WORKERS': '0', 'FAKE_NEWS_STORE': '', **environment}
+        output = subprocess.run([sys.executable, '-W', 'ignore', '-c', snippet], cwd=BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        for name, seconds in json.loads(output.splitlines()[-1]).items():
+            runs.setdefault(f'{prefix}{name}', []).append(seconds)
+
+    article = generate_article(words, rng=random.Random(seed))
+    for _ in range(repeat):
+        collect('', _IMPORT_SNIPPET)
+        for warm_up in ('0', '1'):
+            collect(f'warm_up={warm_up}/', _FIRST_RESULT_SNIPPET.format(script=script, text=article),
+                    FAKE_NEWS_WARM_UP=warm_up)
+    return {name: {'min_s': min(times), 'median_s': statistics.median(times)} for name, times in runs.items()}
+
+
+BENCHMARKS = ('analysis', 'clean', 'load', 'predict', 'app', 'startup')
+
+
+def run_benchmarks(only=BENCHMARKS, quick=False, seed=0):
+    """
+    Run the selected benchmarks and return their results with run metadata
+    """
+    repeat = 3 if quick else 7
+    batch = 200 if quick else 2000
+    results = {}
+    if 'analysis' in only:
+        sizes = (100, 1000, 10000) if quick else (100, 1000, 10000, 100000)
+        results['analysis'] = bench_analysis(sizes, (0.0, 0.05, 0.2), repeat, seed)
+    if 'clean' in only:
+        results['clean'] = bench_clean(batch, 400, repeat, seed)
+    if 'load' in only:
+        results['load'] = bench_model_load(repeat)
+    if 'predict' in only:
+        results['predict'] = bench_predict(batch // 4, 400, repeat, seed)
+    if 'app' in only:
+        results['app'] = bench_app(1 if quick else 3, 400, seed)
+    if 'startup' in only:
+        results['startup'] = bench_startup(1 if quick else 3, 400, seed)
+    return {'meta': _metadata(seed, quick), 'results': results}
+
+
+def _metadata(seed, quick):
+    """
+    Describe the environment a benchmark run happened in
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'quick': quick,
+    }
+
+
+def compare(baseline, current, tolerance=0.1):
+    """
+    Return ``(name, baseline_s, current_s)`` for every median timing that is
+    more than ``tolerance`` slower than in ``baseline``
+    """
+    regressions = []
+    for group, cases in current['results'].items():
+        for case, timing in cases.items():
+            before = baseline.get('results', {}).get(group, {}).get(case, {}).get('median_s')
+            if before and timing['median_s'] > before * (1 + tolerance):
+                regressions.append((f'{group}/{case}', before, timing['median_s']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', help='JSON file to write the results to (default: stdout)')
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help=f'comma-separated subset of {",".join(BENCHMARKS)}')
+    parser.add_argument('--quick', action='store_true', help='fewer repeats and smaller inputs')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the article generator')
+    parser.add_argument('--compare', metavar='BASELINE', help='results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    only = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    report = run_benchmarks(only, args.quick, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for name, before, after in regressions:
+            print(f'REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
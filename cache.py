@@ -0,0 +1,119 @@
+"""
+Bounded result cache keyed by a hash of the normalized article text.
+
+One module-level cache is shared by the Streamlit sessions, the batch CLI
+and the HTTP service running in the same process.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """
+    Normalize an article without changing how any scorer sees it
+    """
+    return text.replace('\r\n', '\n').strip()
+
+
+def content_hash(text):
+    """
+    Return the hex digest identifying an article's normalized text
+    """
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def content_key(text, kind, version=None, top_k=0):
+    """
+    Return the cache key for an article scored by the given kind of analysis,
+    under the given version of the heuristic rules, with ``top_k``
+    ``top_features`` (none when 0)
+    """
+    parts = [kind]
+    if top_k:
+        parts.append(f'top{top_k}')
+    if version:
+        parts.append(version)
+    parts.append(content_hash(text))
+    return ':'.join(parts)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ``ttl_seconds``
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (expires_at, result)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Return a copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key, result):
+        """
+        Store a copy of a result, evicting the least recently used entries
+        """
+        entry = (time.monotonic() + self.ttl_seconds, copy.deepcopy(result))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+
+result_cache = ResultCache()
+
+
+def cached_analysis(kind, text, analyze, cache=result_cache, version=None, top_k=0):
+    """
+    Return ``analyze(text)`` through the cache. Returns ``(result, hit)``.
+    """
+    key = content_key(text, kind, version, top_k)
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+    result = analyze(text)
+    cache.put(key, result)
+    return result, False
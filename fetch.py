@@ -0,0 +1,260 @@
+"""
+Fetch news articles over HTTP and extract their main text.
+
+A single pooled keep-alive session is shared by every fetch. Each request
+has connect/read timeouts, an overall deadline and a cap on the body size,
+and batches of URLs are fetched concurrently on a bounded thread pool.
+"""
+import codecs
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 15.0
+# Seconds a whole download may take, however steadily the server trickles bytes
+TOTAL_TIMEOUT = 60.0
+MAX_BODY_BYTES = 5 * 1024 * 1024
+MAX_WORKERS = 8
+USER_AGENT = 'Mozilla/5.0 (compatible; FakeNewsDetector/1.0)'
+
+
+class FetchError(Exception):
+    """
+    Raised when an article cannot be downloaded or has no extractable text
+    """
+
+
+def make_session(pool_size=MAX_WORKERS):
+    """
+    Create a keep-alive session whose connection pool fits ``pool_size`` threads
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+_session = None
+
+
+def get_session():
+    """
+    Return the process-wide session, creating it on first use
+    """
+    global _session
+    if _session is None:
+        _session = make_session()
+    return _session
+
+
+def _read_body(response, url, max_bytes, deadline):
+    """
+    Read a streamed response body, refusing more than ``max_bytes`` or
+    reading past ``deadline`` (a ``time.monotonic()`` value)
+    """
+    declared = response.headers.get('Content-Length')
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise FetchError(f'{url} is larger than {max_bytes} bytes')
+    body = bytearray()
+    # read1 returns whatever has arrived instead of waiting for a full block,
+    # so the deadline is checked at least once per read timeout
+    while block := response.raw.read1(64 * 1024, decode_content=True):
+        body.extend(block)
+        if len(body) > max_bytes:
+            raise FetchError(f'{url} is larger than {max_bytes} bytes')
+        if time.monotonic() > deadline:
+            raise FetchError(f'{url} took too long to download')
+    return bytes(body)
+
+
+def _encoding(response):
+    """
+    Return the body's declared charset if Python knows it, else UTF-8
+    """
+    # requests assumes ISO-8859-1 for text/* without a charset; most news
+    # sites are UTF-8
+    if 'charset=' not in response.headers.get('Content-Type', '').lower() or not response.encoding:
+        return 'utf-8'
+    try:
+        return codecs.lookup(response.encoding).name
+    except LookupError:
+        # An unknown name such as utf8mb4
+        return 'utf-8'
+
+
+def download(url, session=None, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_bytes=MAX_BODY_BYTES,
+             max_seconds=TOTAL_TIMEOUT):
+    """
+    Download a page as text, refusing bodies larger than ``max_bytes`` or
+    downloads that take longer than ``max_seconds``
+    """
+    session = session or get_session()
+    deadline = time.monotonic() + max_seconds
+    try:
+        with session.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            body = _read_body(response, url, max_bytes, deadline)
+            return body.decode(_encoding(response), errors='replace')
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as exc:
+        raise FetchError(f'Could not fetch {url}: {exc}') from exc
+
+
+def download_if_changed(url, etag=None, modified=None, session=None,
+                        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_bytes=MAX_BODY_BYTES,
+                        max_seconds=TOTAL_TIMEOUT):
+    """
+    Conditionally download ``url`` as raw bytes.
+
+    Returns ``(body, etag, modified)``; ``body`` is None when the server
+    answers 304 Not Modified to the given validators.
+    """
+    session = session or get_session()
+    deadline = time.monotonic() + max_seconds
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+    try:
+        with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304:
+                return None, etag, modified
+            response.raise_for_status()
+            body = _read_body(response, url, max_bytes, deadline)
+            return body, response.headers.get('ETag'), response.headers.get('Last-Modified')
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as exc:
+        raise FetchError(f'Could not fetch {url}: {exc}') from exc
+
+
+class _ParagraphExtractor(HTMLParser):
+    """
+    Collects the page title and the text of <p> elements outside scripts.
+    As in a browser, a paragraph without its ``</p>`` ends where the next
+    block starts or its container ends.
+    """
+
+    SKIPPED = {'script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form'}
+    # Tags that end an open paragraph (HTML's "p" closers and its containers)
+    BLOCKS = {
+        'address', 'article', 'aside', 'blockquote', 'body', 'details', 'dialog', 'dd', 'div', 'dl',
+        'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5',
+        'h6', 'header', 'hgroup', 'hr', 'html', 'li', 'main', 'menu', 'nav', 'ol', 'p', 'pre',
+        'section', 'table', 'td', 'th', 'ul',
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ''
+        self.paragraphs = []
+        self._skip_depth = 0
+        self._in_title = False
+        self._paragraph = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.BLOCKS:
+            self._end_paragraph()
+        if tag in self.SKIPPED:
+            self._skip_depth += 1
+        elif tag == 'title':
+            self._in_title = True
+        elif tag == 'p' and not self._skip_depth:
+            self._paragraph = []
+
+    def handle_endtag(self, tag):
+        if tag in self.BLOCKS:
+            self._end_paragraph()
+        if tag in self.SKIPPED:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'title':
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._paragraph is not None and not self._skip_depth:
+            self._paragraph.append(data)
+
+    def close(self):
+        super().close()
+        self._end_paragraph()
+
+    def _end_paragraph(self):
+        if self._paragraph is not None:
+            text = ' '.join(''.join(self._paragraph).split())
+            if text:
+                self.paragraphs.append(text)
+            self._paragraph = None
+
+
+def extract_article(html, url=''):
+    """
+    Return ``(title, text)`` of the main article in an HTML page.
+
+    Uses newspaper3k when it is installed and falls back to the page's
+    paragraphs otherwise, or when newspaper cannot parse the page (an empty
+    body, for one, makes it raise ArticleException).
+    """
+    try:
+        from newspaper import Article
+    except ImportError:
+        Article = None
+    if Article is not None:
+        try:
+            article = Article(url)
+            article.download(input_html=html)
+            article.parse()
+        except Exception:
+            article = None
+        if article is not None and article.text.strip():
+            return article.title, article.text
+
+    extractor = _ParagraphExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ' '.join(extractor.title.split()), '\n\n'.join(extractor.paragraphs)
+
+
+def fetch_article(url, session=None):
+    """
+    Download a URL and return ``{'url', 'title', 'text'}`` for its article
+    """
+    title, text = extract_article(download(url, session), url)
+    if not text.strip():
+        raise FetchError(f'No article text found at {url}')
+    return {'url': url, 'title': title, 'text': text}
+
+
+def fetch_articles(urls, session=None, max_workers=MAX_WORKERS, max_pending=None):
+    """
+    Fetch many URLs concurrently, yielding ``(url, article, error)`` in input
+    order; exactly one of ``article`` and ``error`` is None.
+
+    At most ``max_pending`` URLs (default twice ``max_workers``) are in
+    flight, so a long URL stream is not read ahead in full.
+    """
+    session = session or get_session()
+    max_pending = max_pending or 2 * max_workers
+
+    def fetch(url):
+        try:
+            return url, fetch_article(url, session), None
+        except Exception as exc:
+            # One bad page must not abort the rest of the batch
+            return url, None, str(exc)
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        pending = deque()
+        for url in urls:
+            pending.append(executor.submit(fetch, url))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
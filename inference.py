@@ -0,0 +1,274 @@
+"""
+Inference with the TF-IDF + LogisticRegression model trained in app.ipynb
+"""
+import copy
+import os
+from functools import lru_cache
+
+import joblib
+import numpy as np
+
+from analysis import advanced_fake_news_analysis, verdict_for_score
+from cache import content_key, result_cache
+from metrics import StageTimer
+from preprocessing import clean_texts
+from rules import registry
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VECTORIZER_PATH = os.path.join(BASE_DIR, 'vectorizer.jb')
+MODEL_PATH = os.path.join(BASE_DIR, 'lr_model.jb')
+
+# Directory written by `python artifacts.py export`; when set, the compact
+# memory-mapped artifacts are served instead of the joblib pickles
+MODEL_DIR = os.environ.get('FAKE_NEWS_MODEL_DIR')
+
+# The notebook labels Fake.csv articles 0 and True.csv articles 1
+REAL_CLASS = 1
+
+# Number of model tokens reported with each prediction
+TOP_FEATURES = 10
+
+# Hybrid scoring: share of the credibility score taken from the model's
+# probability (the heuristics get the rest), and the probability either way
+# beyond which the model alone decides and the heuristics are skipped
+MODEL_WEIGHT = 0.5
+CONFIDENT_PROBABILITY = 0.95
+
+VERDICT_STATUS = {'reliable': 'pass', 'questionable': 'warning', 'unreliable': 'fail'}
+
+
+@lru_cache(maxsize=None)
+def load_model(vectorizer_path=VECTORIZER_PATH, model_path=MODEL_PATH, model_dir=MODEL_DIR):
+    """
+    Load the fitted vectorizer and classifier, once per process
+    """
+    if model_dir:
+        from artifacts import load_compact_model
+        return load_compact_model(model_dir)
+    return joblib.load(vectorizer_path), joblib.load(model_path)
+
+
+def _real_probabilities(features, classifier):
+    """
+    Return the real-news column of predict_proba for a feature matrix
+    """
+    timer = StageTimer('model.')
+    probabilities = classifier.predict_proba(features)
+    timer.lap('predict')
+    return probabilities[:, list(classifier.classes_).index(REAL_CLASS)]
+
+
+def _transform(texts, vectorizer):
+    """
+    Clean and vectorize a batch of articles, timing each stage
+    """
+    timer = StageTimer('model.')
+    cleaned = clean_texts(texts)
+    timer.lap('preprocess')
+    features = vectorizer.transform(cleaned)
+    timer.lap('vectorize')
+    return features
+
+
+def predict_proba_batch(texts, model=None):
+    """
+    Return the probability that each article is real news, using a single
+    sparse transform and predict_proba call for the whole batch
+    """
+    vectorizer, classifier = model or load_model()
+    return _real_probabilities(_transform(texts, vectorizer), classifier)
+
+
+def predict_proba(text, model=None):
+    """
+    Return the model's probability that an article is real news
+    """
+    return float(predict_proba_batch([text], model)[0])
+
+
+@lru_cache(maxsize=4)
+def _feature_names(vectorizer):
+    """
+    Return the vectorizer's index-to-term array, built once per vectorizer
+    """
+    return vectorizer.get_feature_names_out()
+
+
+def _term(vectorizer, index):
+    """
+    Return the vocabulary term at a feature index
+    """
+    if hasattr(vectorizer, 'term'):
+        return vectorizer.term(index)
+    return str(_feature_names(vectorizer)[index])
+
+
+def top_features(features, vectorizer, classifier, k=TOP_FEATURES):
+    """
+    Return the ``k`` tokens contributing most to each row's prediction.
+
+    A token's contribution is its TF-IDF weight times its coefficient, signed
+    so that positive values push towards real news. Only the stored nonzeros
+    of the CSR matrix are touched, never a dense vocabulary-wide row.
+    """
+    features = features.tocsr()
+    coef = np.asarray(classifier.coef_[0])
+    if list(classifier.classes_).index(REAL_CLASS) == 0:
+        coef = -coef
+    contributions = features.data * coef[features.indices]
+
+    # Sort every row's nonzeros by descending magnitude in one pass, then keep
+    # the first k of each row
+    row_lengths = np.diff(features.indptr)
+    rows = np.repeat(np.arange(features.shape[0]), row_lengths)
+    order = np.lexsort((-np.abs(contributions), rows))
+    ranks = np.arange(order.size) - np.repeat(features.indptr[:-1], row_lengths)
+    kept = order[ranks < k]
+    kept_rows = rows[kept]
+
+    attributions = [[] for _ in range(features.shape[0])]
+    for row, index, weight in zip(kept_rows.tolist(), features.indices[kept].tolist(),
+                                  contributions[kept].tolist()):
+        attributions[row].append({'term': _term(vectorizer, index), 'weight': weight})
+    return attributions
+
+
+def explain_batch(texts, model=None, k=TOP_FEATURES):
+    """
+    Return ``(real_probabilities, attributions)`` for many articles from one
+    transform, where each attribution is a list of ``{'term', 'weight'}``
+    """
+    vectorizer, classifier = model or load_model()
+    features = _transform(texts, vectorizer)
+    probabilities = _real_probabilities(features, classifier)
+    timer = StageTimer('model.')
+    attributions = top_features(features, vectorizer, classifier, k)
+    timer.lap('attribution')
+    return probabilities, attributions
+
+
+def _model_result(real_probability, attributions=None):
+    """
+    Build an analysis result dict from the model's real-news probability
+    """
+    credibility_score = round(real_probability * 100)
+    verdict, summary = verdict_for_score(credibility_score)
+
+    factors = [{'name': 'Trained Model', 'status': VERDICT_STATUS[verdict],
+                'description': f'The TF-IDF + logistic regression model rates this content {real_probability:.0%} likely to be real news.'}]
+
+    result = {
+        'credibility_score': credibility_score,
+        'verdict': verdict,
+        'factors': factors,
+        'summary': summary,
+        'real_probability': real_probability
+    }
+    if attributions is not None:
+        result['top_features'] = attributions
+    return result
+
+
+def model_fake_news_analysis(text, model=None, k=TOP_FEATURES):
+    """
+    Score an article with the trained model, in the same shape as
+    advanced_fake_news_analysis plus the ``k`` most influential tokens
+    """
+    probabilities, attributions = explain_batch([text], model, k)
+    return _model_result(float(probabilities[0]), attributions[0])
+
+
+def _hybrid_result(text, real_probability, attributions=None,
+                   model_weight=MODEL_WEIGHT, confidence=CONFIDENT_PROBABILITY):
+    """
+    Fuse the model's probability with the heuristic score, skipping the
+    heuristics entirely when the model is confident enough on its own
+    """
+    if max(real_probability, 1 - real_probability) >= confidence:
+        result = _model_result(real_probability, attributions)
+        result['early_exit'] = True
+        return result
+
+    heuristic = advanced_fake_news_analysis(text)
+    model_result = _model_result(real_probability, attributions)
+    credibility_score = round(model_weight * real_probability * 100
+                              + (1 - model_weight) * heuristic['credibility_score'])
+    verdict, summary = verdict_for_score(credibility_score)
+    result = {
+        'credibility_score': credibility_score,
+        'verdict': verdict,
+        'factors': model_result['factors'] + heuristic['factors'],
+        'summary': summary,
+        'real_probability': real_probability,
+        'heuristic_score': heuristic['credibility_score'],
+        'early_exit': False
+    }
+    if attributions is not None:
+        result['top_features'] = attributions
+    return result
+
+
+def hybrid_fake_news_analysis(text, model=None, model_weight=MODEL_WEIGHT,
+                              confidence=CONFIDENT_PROBABILITY, k=TOP_FEATURES):
+    """
+    Score an article with a weighted blend of the trained model and the
+    heuristics. When the model's probability is at least ``confidence`` either
+    way the heuristics are not run and ``early_exit`` is True.
+    """
+    probabilities, attributions = explain_batch([text], model, k)
+    return _hybrid_result(text, float(probabilities[0]), attributions[0], model_weight, confidence)
+
+
+def analyze_batch(texts, model=None, heuristics=True, cache=result_cache, top_k=0,
+                  hybrid=False, model_weight=MODEL_WEIGHT, confidence=CONFIDENT_PROBABILITY):
+    """
+    Score many articles at once.
+
+    The model runs once over the articles missing from ``cache`` (pass None to
+    bypass it). With ``heuristics`` each result is the
+    advanced_fake_news_analysis dict plus ``real_probability``, otherwise it is
+    the model_fake_news_analysis dict. ``hybrid`` returns
+    hybrid_fake_news_analysis dicts instead, running the heuristics only for
+    articles the model is unsure about. A positive ``top_k`` adds the
+    ``top_features`` attribution of that many tokens to each result.
+    """
+    texts = list(texts)
+    if hybrid:
+        kind = f'hybrid:{model_weight}:{confidence}'
+    else:
+        kind = 'combined' if heuristics else 'model'
+    # Model-only results do not depend on the heuristic rules
+    version = registry.current().version if heuristics or hybrid else None
+    keys = [content_key(text, kind, version, top_k) for text in texts]
+    results = [cache.get(key) if cache is not None else None for key in keys]
+
+    # Score each distinct uncached article once
+    pending = {}
+    for index, (key, result) in enumerate(zip(keys, results)):
+        if result is None:
+            pending.setdefault(key, index)
+    if pending:
+        indexes = list(pending.values())
+        batch = [texts[index] for index in indexes]
+        if top_k:
+            probabilities, attributions = explain_batch(batch, model, top_k)
+        else:
+            probabilities, attributions = predict_proba_batch(batch, model), [None] * len(batch)
+        for index, real_probability, attribution in zip(indexes, probabilities.tolist(), attributions):
+            if hybrid:
+                result = _hybrid_result(texts[index], real_probability, attribution, model_weight, confidence)
+            elif heuristics:
+                result = advanced_fake_news_analysis(texts[index])
+                result['real_probability'] = real_probability
+                if attribution is not None:
+                    result['top_features'] = attribution
+            else:
+                result = _model_result(real_probability, attribution)
+            results[index] = result
+            if cache is not None:
+                cache.put(keys[index], result)
+
+    for index, key in enumerate(keys):
+        if results[index] is None:
+            results[index] = copy.deepcopy(results[pending[key]])
+    return results
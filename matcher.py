@@ -0,0 +1,638 @@
+"""
+Single-scan counting of many regular expressions at once
+"""
+import re
+from collections import OrderedDict
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:   # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+# Characters of segment windows a SegmentCounter keeps at least
+MAX_CACHED_CHARS = 64 * 1024
+
+# Paragraphs longer than this are split into sentences by split_segments
+SEGMENT_CHARS = 1000
+
+# A paragraph, up to and including the whitespace run holding its newline,
+# and a sentence, up to the whitespace run after its punctuation
+PARAGRAPH = re.compile(r'[^\n]*(?:\n\s*|\Z)')
+SENTENCE = re.compile(r'[^.!?]*(?:[.!?]+(?!\s)[^.!?]*)*(?:[.!?]+\s+|\Z)')
+
+# Category escapes that can match whitespace, and that can match a
+# non-whitespace character
+_SPACE_CATEGORIES = {sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_NOT_DIGIT,
+                     sre_constants.CATEGORY_NOT_WORD, sre_constants.CATEGORY_LINEBREAK}
+_NON_SPACE_CATEGORIES = {sre_constants.CATEGORY_NOT_SPACE, sre_constants.CATEGORY_DIGIT,
+                         sre_constants.CATEGORY_NOT_DIGIT, sre_constants.CATEGORY_WORD,
+                         sre_constants.CATEGORY_NOT_WORD, sre_constants.CATEGORY_NOT_LINEBREAK}
+# Every whitespace character: the Basic Multilingual Plane's highest is U+3000
+_SPACE_CODES = [code for code in range(0x3001) if chr(code).isspace()]
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+            getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT)}
+
+
+def _syntax(pattern):
+    """
+    Yield ``(index, char, depth)`` for every pattern character outside of
+    escapes and character classes
+    """
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+            # A ']' right after '[' or '[^' is a literal
+            i += 2 if pattern.startswith('[^]', i) else 1 if pattern.startswith('[]', i) else 0
+        else:
+            if char == ')':
+                depth -= 1
+            yield i, char, depth
+            if char == '(':
+                depth += 1
+        i += 1
+
+
+def _split_on_gaps(pattern):
+    """
+    Split a pattern on its top-level ``.*`` gaps, e.g. ``a.*b`` -> ``['a', 'b']``
+    """
+    parts = []
+    last = 0
+    for i, char, depth in _syntax(pattern):
+        if depth or i < last:
+            continue
+        if char == '|':
+            # Top-level alternation binds looser than the gap, keep it whole
+            return [f'(?:{pattern})']
+        if pattern.startswith('.*', i) and not pattern.startswith('.*+', i):
+            parts.append(pattern[last:i])
+            last = i + (3 if pattern.startswith('.*?', i) else 2)
+    parts.append(pattern[last:])
+    return [part for part in parts if part] or [pattern]
+
+
+def _non_capturing(pattern):
+    """
+    Turn every capturing group of a pattern into a non-capturing one
+    """
+    pieces = []
+    last = 0
+    for i, char, _ in _syntax(pattern):
+        if char != '(':
+            continue
+        if pattern.startswith('(?P<', i):
+            pieces.append(pattern[last:i] + '(?:')
+            last = pattern.index('>', i) + 1
+        elif not pattern.startswith('(?', i):
+            pieces.append(pattern[last:i] + '(?:')
+            last = i + 1
+    pieces.append(pattern[last:])
+    return ''.join(pieces)
+
+
+def _context_dependent(pattern):
+    """
+    Whether a pattern can match differently in a substring than in the whole
+    text: anchors and lookarounds see past the substring's ends
+    """
+    for i, char, _ in _syntax(pattern):
+        if char in '^$' or pattern.startswith(('(?=', '(?!', '(?<'), i):
+            return True
+    # Escapes are skipped by _syntax; this may also flag a literal backslash
+    # followed by A, B or Z, which only costs the incremental shortcut. \B is
+    # flagged because a segment ends after a newline, where it would hold
+    # even if the whole text continues with a word character.
+    return re.search(r'\\[ABZ]', pattern) is not None
+
+
+def _class_reach(items):
+    """
+    Return ``(matches whitespace, matches non-whitespace)`` for a character
+    class
+    """
+    negated = bool(items) and items[0][0] is sre_constants.NEGATE
+    spaces = set()   # whitespace code points the class lists
+    non_space = False
+    for op, av in items[negated:]:
+        if op is sre_constants.LITERAL:
+            if chr(av).isspace():
+                spaces.add(av)
+            else:
+                non_space = True
+        elif op is sre_constants.RANGE:
+            low, high = av
+            listed = [code for code in _SPACE_CODES if low <= code <= high]
+            spaces.update(listed)
+            non_space |= high - low + 1 > len(listed)
+        elif op is sre_constants.CATEGORY:
+            if av in _SPACE_CATEGORIES:
+                spaces.update(_SPACE_CODES)
+            non_space |= av in _NON_SPACE_CATEGORIES
+        else:
+            spaces.update(_SPACE_CODES)
+            non_space = True
+    if negated:
+        return len(spaces) < len(_SPACE_CODES), True
+    return bool(spaces), non_space
+
+
+def _reach(items):
+    """
+    Return ``(matches whitespace, most words matched)`` for each item of a
+    parsed pattern, a word being a run of non-whitespace characters; the
+    word count is None when unbounded
+    """
+    reaches = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            reach = chr(av).isspace(), int(not chr(av).isspace())
+        elif op in (sre_constants.NOT_LITERAL, sre_constants.ANY):
+            reach = True, 1
+        elif op is sre_constants.IN:
+            space, non_space = _class_reach(av)
+            reach = space, int(non_space)
+        elif op is sre_constants.CATEGORY:
+            reach = av in _SPACE_CATEGORIES, int(av in _NON_SPACE_CATEGORIES)
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            reach = False, 0
+        elif op in _REPEATS:
+            _, high, body = av
+            space, words = _sequence_reach(body)
+            if high == 0:
+                reach = False, 0
+            elif not space or not words:
+                # Repeating a word without whitespace still makes one word
+                reach = space, words
+            else:
+                reach = space, None if high is sre_constants.MAXREPEAT or words is None else words * high
+        elif op is sre_constants.SUBPATTERN:
+            reach = _sequence_reach(av[-1])
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            reach = _sequence_reach(av)
+        elif op is sre_constants.BRANCH:
+            branches = [_sequence_reach(branch) for branch in av[1]]
+            words = [count for _, count in branches]
+            reach = any(space for space, _ in branches), None if None in words else max(words)
+        else:
+            reach = True, None
+        reaches.append(reach)
+    return reaches
+
+
+def _sequence_reach(items, reaches=None):
+    """
+    Combine item reaches: consecutive items that never match whitespace
+    make at most one word together
+    """
+    if reaches is None:
+        reaches = _reach(items)
+    words = 0
+    in_word = False
+    for space, count in reaches:
+        if count is None:
+            words = None
+            break
+        if space:
+            words += count
+            in_word = False
+        elif count and not in_word:
+            words += 1
+            in_word = True
+    return any(space for space, _ in reaches), words
+
+
+def _atom_reach(atom):
+    """
+    Return the most words a match of ``atom`` can hold between its first
+    and last item that can match whitespace, or None when unbounded
+    """
+    reaches = _reach(sre_parse.parse(atom))
+    crossing = [index for index, (space, _) in enumerate(reaches) if space]
+    if not crossing:
+        return 0
+    return _sequence_reach(None, reaches=reaches[crossing[0]:crossing[-1] + 1])[1]
+
+
+def crossing_reach(pattern):
+    """
+    Return the most words a match of one of ``pattern``'s atoms (its parts
+    between ``.*`` gaps) can hold between its first and last whitespace, or
+    None when unbounded. In ``\\bthis\\s+one\\s+trick\\b`` it is 1, the
+    ``one`` that a segment between the other two could hold.
+    """
+    reaches = [_atom_reach(atom) for atom in _split_on_gaps(pattern)]
+    return None if None in reaches else max(reaches)
+
+
+def split_segments(text):
+    """
+    Split a text into paragraphs, and paragraphs longer than SEGMENT_CHARS
+    into sentences. Every cut lies after a run of whitespace and before a
+    non-whitespace character, so no word or run of sentence punctuation
+    spans one.
+    """
+    segments = []
+    for paragraph in PARAGRAPH.findall(text):
+        if len(paragraph) > SEGMENT_CHARS:
+            segments.extend(sentence for sentence in SENTENCE.findall(paragraph) if sentence)
+        elif paragraph:
+            segments.append(paragraph)
+    return segments or [text]
+
+
+def _first_chars(atom):
+    """
+    Return the characters an atom can start with, or None if unknown
+    """
+    body = atom[2:] if atom.startswith(r'\b') else atom
+    if body[1:2] in ('?', '*', '{'):
+        return None
+    if body[:1].isalnum():
+        return body[0]
+    if body.startswith(r'\d') and body[2:3] not in ('?', '*', '{'):
+        return '0123456789'
+    return None
+
+
+class PatternMatcher:
+    """
+    Counts, per category, how many patterns occur in a text using one scan.
+
+    Every pattern is split on its ``.*`` gaps into atoms. A single alternation
+    of all atoms finds the next position where any of them starts, and a probe
+    of lookaheads reports every atom starting there. ``a.*b`` then matches when
+    an ``a`` ends before a ``b`` starts with no newline in between, which is
+    exactly what ``re.search`` would decide, minus the backtracking.
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        # Whether every atom matches within a run of segments the same way as
+        # within the whole text, and how many words of a segment an atom
+        # crossing it can hold (see SegmentCounter)
+        patterns = [pattern for patterns in categories.values() for pattern in patterns]
+        reaches = [crossing_reach(pattern) for pattern in patterns]
+        self.segment_local = None not in reaches and not any(_context_dependent(pattern) for pattern in patterns)
+        self.reach = max(reaches) if self.segment_local and reaches else 0
+        self._patterns = []   # (category index, number of atoms)
+        atoms = []            # (pattern index, stage)
+        sources = []
+        for category_index, patterns in enumerate(categories.values()):
+            for pattern in patterns:
+                parts = _split_on_gaps(pattern)
+                pattern_index = len(self._patterns)
+                self._patterns.append((category_index, len(parts)))
+                for stage, part in enumerate(parts):
+                    atoms.append((pattern_index, stage))
+                    sources.append(_non_capturing(part))
+
+        # Hoisting the leading word boundary out of the alternation lets the
+        # scanner reject mid-word positions with a single check
+        bounded = [source[2:] for source in sources if source.startswith(r'\b')]
+        unbounded = [source for source in sources if not source.startswith(r'\b')]
+        alternatives = [f'(?:{source})' for source in unbounded]
+        if bounded:
+            alternatives.insert(0, r'\b(?:' + '|'.join(f'(?:{source})' for source in bounded) + ')')
+        self._scanner = re.compile('|'.join(alternatives))
+
+        # Probes are bucketed by first character so a hit only evaluates the
+        # atoms that could start there
+        first_chars = [_first_chars(source) for source in sources]
+        keys = set(''.join(chars for chars in first_chars if chars))
+        self._probes = {}
+        for key in keys | {None}:
+            members = [index for index, chars in enumerate(first_chars)
+                       if chars is None or (key is not None and key in chars)]
+            probe = re.compile(''.join(f'(?:(?=({sources[index]}))|)' for index in members))
+            self._probes[key] = (probe.match, [atoms[index] for index in members])
+
+    def count(self, text):
+        """
+        Return a dict mapping each category to its number of matching patterns
+        """
+        state = _ScanState(self)
+        self._scan(text, state, 0, len(text) + 1)
+        return state.counts()
+
+    def stream(self, overlap=64 * 1024):
+        """
+        Return a StreamCounter that counts over text fed in chunks
+        """
+        return StreamCounter(self, overlap)
+
+    def matched(self, text):
+        """
+        Return the patterns that occur in a text as a bitmask
+        """
+        state = _ScanState(self)
+        self._scan(text, state, 0, len(text) + 1)
+        return state.mask()
+
+    def counts_for(self, mask):
+        """
+        Return the category counts of a bitmask of matched patterns
+        """
+        counts = dict.fromkeys(self.categories, 0)
+        for index, (category_index, _) in enumerate(self._patterns):
+            if mask >> index & 1:
+                counts[self.categories[category_index]] += 1
+        return counts
+
+    def atom_matches(self, text, stop):
+        """
+        Return ``((pattern index, stage), start, end)`` for every atom match
+        in ``text`` starting before ``stop``, in the order ``_scan`` sees them
+        """
+        found = []
+        search = self._scanner.search
+        probes = self._probes
+        default = probes[None]
+        match = search(text)
+        while match is not None:
+            start = match.start()
+            if start >= stop:
+                break
+            probe, atoms = probes.get(text[start], default)
+            for atom, (_, end) in zip(atoms, probe(text, start).regs[1:]):
+                if end >= 0:
+                    found.append((atom, start, end))
+            match = search(text, start + 1)
+        return found
+
+    def _scan(self, text, state, position, stop, base=0, newline_before=-1):
+        """
+        Advance ``state`` over every candidate match in ``text`` starting at
+        ``position`` or later and before ``stop``; returns ``stop``.
+
+        ``text`` begins at global offset ``base``; ends recorded in ``state``
+        are global, and ``newline_before`` is the global offset of the last
+        newline before ``base`` (or -1).
+        """
+        matched = state.matched
+        reachable = state.reachable
+        patterns = self._patterns
+        search = self._scanner.search
+        probes = self._probes
+        default = probes[None]
+        match = search(text, position)
+        while match is not None and state.remaining:
+            start = match.start()
+            if start >= stop:
+                # Positions from ``stop`` on may not have enough text after
+                # them yet, so the scan resumes there rather than here
+                return stop
+            probe, atoms = probes.get(text[start], default)
+            spans = probe(text, start).regs[1:]
+            hits = [(atom, end) for atom, (_, end) in zip(atoms, spans) if end >= 0]
+            for (pattern_index, stage), end in hits:
+                if matched[pattern_index]:
+                    continue
+                if stage:
+                    ends = reachable[pattern_index][stage - 1]
+                    best = max((e for e in ends if e <= base + start), default=-1)
+                    if best < 0:
+                        continue
+                    if best >= base:
+                        crossed = text.find('\n', best - base, start) >= 0
+                    else:
+                        crossed = text.rfind('\n', 0, start) >= 0 or newline_before >= best
+                    if crossed:
+                        # Every earlier end is behind the same newline
+                        ends[:] = [e for e in ends if e > base + start]
+                        continue
+                if stage == patterns[pattern_index][1] - 1:
+                    matched[pattern_index] = True
+                    state.remaining -= 1
+                else:
+                    ends = reachable[pattern_index][stage]
+                    # Only the latest end before this position can still be useful
+                    latest = max((e for e in ends if e <= base + start), default=-1)
+                    ends[:] = [e for e in ends if e > base + start] + ([latest] if latest >= 0 else [])
+                    ends.append(base + end)
+            match = search(text, start + 1)
+        return stop
+
+
+class _ScanState:
+    """
+    Which patterns have matched, and where partial ``a.*b`` matches can continue
+    """
+
+    __slots__ = ('matcher', 'matched', 'reachable', 'remaining')
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.matched = [False] * len(matcher._patterns)
+        self.reachable = [[[] for _ in range(stages - 1)] for _, stages in matcher._patterns]
+        self.remaining = len(matcher._patterns)
+
+    def mask(self):
+        return sum(1 << index for index, hit in enumerate(self.matched) if hit)
+
+    def counts(self):
+        matcher = self.matcher
+        counts = dict.fromkeys(matcher.categories, 0)
+        for (category_index, _), hit in zip(matcher._patterns, self.matched):
+            if hit:
+                counts[matcher.categories[category_index]] += 1
+        return counts
+
+
+class StreamCounter:
+    """
+    Counts like PatternMatcher.count over text that arrives in chunks,
+    keeping only a bounded window in memory.
+
+    A candidate position is only scanned once at least ``overlap`` characters
+    follow it, so any match shorter than ``overlap`` is seen whole, and a
+    little text is kept before it for word-boundary context. Results equal
+    ``count`` of the concatenated text unless a single atom match is longer
+    than ``overlap``.
+    """
+
+    CONTEXT = 256
+
+    def __init__(self, matcher, overlap=64 * 1024):
+        self.matcher = matcher
+        self.overlap = overlap
+        self._state = _ScanState(matcher)
+        self._buffer = ''
+        self._base = 0
+        self._position = 0
+        self._newline_before = -1
+
+    def feed(self, chunk):
+        """
+        Add the next chunk of text
+        """
+        self._buffer += chunk
+        self._advance(len(self._buffer) - self.overlap)
+
+    def counts(self):
+        """
+        Finish the stream and return the category counts
+        """
+        self._advance(len(self._buffer) + 1)
+        return self._state.counts()
+
+    def _advance(self, stop):
+        if stop <= self._position:
+            return
+        self._position = self.matcher._scan(self._buffer, self._state, self._position, stop,
+                                            self._base, self._newline_before)
+        # Drop what can no longer be scanned, keeping some context before the
+        # resume position
+        drop = self._position - self.CONTEXT
+        if drop > 0:
+            newline = self._buffer.rfind('\n', 0, drop)
+            if newline >= 0:
+                self._newline_before = self._base + newline
+            self._buffer = self._buffer[drop:]
+            self._base += drop
+            self._position -= drop
+
+
+class TextCache(OrderedDict):
+    """
+    LRU cache keyed by strings, bounded by the total length of its keys
+    rather than their number. Lookups use ``get`` and mark a hit with
+    ``move_to_end``, both plain OrderedDict methods, so a scan over many
+    cached segments stays cheap.
+    """
+
+    def __init__(self, max_chars):
+        super().__init__()
+        self.max_chars = max_chars
+        self.chars = 0
+
+    def put(self, key, value):
+        if key in self:
+            self.chars -= len(key)
+        self[key] = value
+        self.move_to_end(key)
+        self.chars += len(key)
+        self.evict()
+
+    def evict(self):
+        """
+        Drop the least recently used entries until the keys fit ``max_chars``
+        """
+        while self.chars > self.max_chars and self:
+            key, _ = self.popitem(last=False)
+            self.chars -= len(key)
+
+
+class SegmentCounter:
+    """
+    Counts like PatternMatcher.count over successive versions of an edited
+    text, caching the atom matches found in every sentence and paragraph
+    (see split_segments) so a new version only scans the segments that
+    changed.
+
+    Every cut between segments lies between a whitespace and a
+    non-whitespace character, so an atom match crossing cuts holds the
+    whole segments between them, each with at most ``matcher.reach`` words
+    (see crossing_reach). The matches starting in a segment are found in the
+    window running from it through every following segment up to the first
+    one too long to lie inside a match; the window starts and ends at cuts,
+    where word boundaries see what they see in the whole text, so they are
+    exactly the matches the whole text has there. The atoms are then joined
+    across their ``.*`` gaps as ``PatternMatcher._scan`` joins them, and the
+    count equals ``count`` of the whole text.
+
+    Patterns with anchors, lookarounds or an atom of unbounded reach, texts
+    of one segment, and texts whose windows would add up to more than
+    ``max_growth`` times their length are counted in one scan of the whole
+    text. The cache keeps at least ``max_cached_chars`` characters of
+    windows, or twice the current version's, and never the whole text.
+    """
+
+    def __init__(self, matcher, max_cached_chars=MAX_CACHED_CHARS, max_growth=4):
+        self.matcher = matcher
+        self.max_cached_chars = max_cached_chars
+        self.max_growth = max_growth
+        self._cache = TextCache(max_cached_chars)   # window -> atom matches in its first segment
+
+    def count(self, text):
+        """
+        Return the category counts of ``text``
+        """
+        matcher = self.matcher
+        if not matcher.segment_local:
+            return matcher.count(text)
+        segments = split_segments(text)
+        if len(segments) < 2:
+            return matcher.count(text)
+
+        offsets = [0]
+        for segment in segments:
+            offsets.append(offsets[-1] + len(segment))
+        # The window of segment k runs to the end of segment ends[k] - 1
+        reach = matcher.reach
+        budget = self.max_growth * len(text)
+        ends = [len(segments)] * len(segments)
+        for k in range(len(segments) - 2, -1, -1):
+            if len(segments[k + 1].split(None, reach)) > reach:
+                ends[k] = k + 2
+            else:
+                ends[k] = ends[k + 1]
+            budget -= offsets[ends[k]] - offsets[k]
+            if budget < 0:
+                return matcher.count(text)
+        # Keep at least the current version's windows, or scanning them in
+        # order would evict each one before it is next needed
+        self._cache.max_chars = max(self.max_cached_chars, 2 * (self.max_growth * len(text) - budget))
+
+        state = _ScanState(matcher)
+        cache = self._cache
+        for k, end in enumerate(ends):
+            base = offsets[k]
+            window = text[base:offsets[end]]
+            found = cache.get(window)
+            if found is not None:
+                cache.move_to_end(window)
+            else:
+                found = matcher.atom_matches(window, len(segments[k]))
+                if len(window) < len(text):
+                    cache.put(window, found)
+            for atom, start, atom_end in found:
+                self._join(state, text, atom, base + start, base + atom_end)
+        self._cache.evict()
+        return state.counts()
+
+    def _join(self, state, text, atom, start, end):
+        """
+        Advance ``state`` by an atom match of the whole text, as
+        ``PatternMatcher._scan`` does
+        """
+        pattern_index, stage = atom
+        if state.matched[pattern_index]:
+            return
+        if stage:
+            ends = state.reachable[pattern_index][stage - 1]
+            best = max((e for e in ends if e <= start), default=-1)
+            if best < 0:
+                return
+            if text.find('\n', best, start) >= 0:
+                # Every earlier end is behind the same newline
+                ends[:] = [e for e in ends if e > start]
+                return
+        if stage == self.matcher._patterns[pattern_index][1] - 1:
+            state.matched[pattern_index] = True
+            state.remaining -= 1
+        else:
+            ends = state.reachable[pattern_index][stage]
+            # Only the latest end before this position can still be useful
+            latest = max((e for e in ends if e <= start), default=-1)
+            ends[:] = [e for e in ends if e > start] + ([latest] if latest >= 0 else [])
+            ends.append(end)
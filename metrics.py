@@ -0,0 +1,168 @@
+"""
+Per-stage latency histograms in Prometheus text format, plus opt-in
+per-request traces.
+
+Hot paths call ``StageTimer.lap`` (or ``record``) after each stage; every
+observation goes into a process-wide histogram labelled by stage and, while
+a ``collect_trace`` block is active in the current context, into that
+request's trace as well.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Set FAKE_NEWS_METRICS=0 to turn recording off
+ENABLED = os.environ.get('FAKE_NEWS_METRICS', '1') != '0'
+
+# Upper bounds in seconds; +Inf is implicit
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_NAME = 'fake_news_stage_seconds'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_trace = ContextVar('trace', default=None)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class StageMetrics:
+    """
+    Thread-safe set of histograms, one per stage
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """
+        Return all histograms in the Prometheus text exposition format
+        """
+        lines = [f'# HELP {METRIC_NAME} Latency of each analysis stage in seconds.',
+                 f'# TYPE {METRIC_NAME} histogram']
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+stage_metrics = StageMetrics()
+
+
+def record(stage, seconds):
+    """
+    Record one stage's latency in the histograms and the active trace
+    """
+    if not ENABLED:
+        return
+    stage_metrics.observe(stage, seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace[stage] = round(trace.get(stage, 0.0) + seconds * 1000, 3)
+
+
+class StageTimer:
+    """
+    Times consecutive stages: each ``lap`` records the time since the
+    previous one under ``prefix + name``
+    """
+
+    __slots__ = ('prefix', '_last')
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        record(self.prefix + name, now - self._last)
+        self._last = now
+
+
+@contextmanager
+def timed(stage):
+    """
+    Record the duration of a ``with`` block as one stage
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_trace():
+    """
+    Collect the stages recorded in this context into a ``{stage: ms}`` dict
+    """
+    trace = {}
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = stage_metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """
+    Serve GET /metrics from a daemon thread, for processes such as the
+    Streamlit app that have no HTTP endpoint of their own
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
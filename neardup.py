@@ -0,0 +1,280 @@
+"""
+Near-duplicate index for articles that were already scored.
+
+Articles are reduced to a MinHash signature of their word 3-shingles, taken
+over the same tokens clean_text produces, and keep only the lowest 16 bits
+of each of the 64 minimums (b-bit MinHash): 128 bytes per article. The
+signature is split into 16 bands of 4 values; every band packs into one
+uint64 key, and each band keeps its keys in a sorted array, so a lookup is
+16 binary searches plus a comparison of the few candidate signatures.
+Entries added since the last merge wait in small per-band dicts until
+MERGE_EVERY of them are folded into the sorted arrays.
+
+Two articles with shingle Jaccard similarity s share a band with
+probability 1 - (1 - s^4)^16: 99.98% at s = 0.8, 64% at 0.5. Candidates are
+then accepted only if their estimated similarity reaches the threshold.
+
+The index remembers the version of the heuristic rules its verdicts were
+reached under and is emptied when the rules change.
+"""
+import zlib
+
+import numpy as np
+
+from analysis import verdict_for_score
+from inference import VERDICT_STATUS
+from preprocessing import clean_text
+from rules import registry
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+THRESHOLD = 0.8
+MERGE_EVERY = 50000
+SEED = 20240611
+
+# Multiply-shift hash parameters, fixed so signatures are stable on disk
+_rng = np.random.default_rng(SEED)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+
+def minhash_signature(text):
+    """
+    Return the uint16 b-bit MinHash signature of an article, or None if it
+    has no tokens after cleaning
+    """
+    tokens = clean_text(text).split()
+    if not tokens:
+        return None
+    hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens),
+                         dtype=np.uint64, count=len(tokens))
+    if len(hashes) >= SHINGLE:
+        # Combine consecutive token hashes into shingle hashes
+        shingles = hashes[:len(hashes) - SHINGLE + 1] * _MIX[0]
+        for offset in range(1, SHINGLE):
+            shingles ^= hashes[offset:len(hashes) - SHINGLE + 1 + offset] * _MIX[offset]
+    else:
+        shingles = hashes * _MIX[0]
+    shingles = np.unique(shingles)
+    minimums = (shingles[:, None] * _A + _B).min(axis=0)
+    return (minimums & np.uint64(0xFFFF)).astype(np.uint16)
+
+
+def _band_keys(signature):
+    """
+    Pack each band's four 16-bit values into one uint64 key
+    """
+    return signature.reshape(BANDS, ROWS).astype('<u2').view('<u8').ravel()
+
+
+class NearDuplicateIndex:
+    """
+    Array-backed MinHash LSH index mapping signatures to earlier verdicts
+    """
+
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.rules_version = None
+        self.clear()
+
+    def clear(self):
+        """
+        Remove every indexed article
+        """
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint16)
+        self._scores = np.empty(0, dtype=np.uint8)
+        self._probabilities = np.empty(0, dtype=np.float32)
+        self._ids = []
+        self._band_sorted = [np.empty(0, dtype=np.uint64)] * BANDS
+        self._band_entries = [np.empty(0, dtype=np.int32)] * BANDS
+        self._pending = [{} for _ in range(BANDS)]
+        self._pending_signatures = []
+        self._pending_scores = []
+        self._pending_probabilities = []
+        self._pending_count = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, signature, article_id, result):
+        """
+        Index an article's signature with the score of its analysis result
+        """
+        entry = len(self._ids)
+        self._ids.append(str(article_id))
+        self._pending_signatures.append(signature)
+        self._pending_scores.append(result['credibility_score'])
+        self._pending_probabilities.append(result.get('real_probability', np.nan))
+        for band, key in enumerate(_band_keys(signature).tolist()):
+            self._pending[band].setdefault(key, []).append(entry)
+        self._pending_count += 1
+        if self._pending_count >= MERGE_EVERY:
+            self._merge()
+        return entry
+
+    def _merge(self):
+        """
+        Fold the pending entries into the sorted band arrays
+        """
+        if not self._pending_count:
+            return
+        first = len(self._signatures)
+        signatures = np.stack(self._pending_signatures)
+        self._signatures = np.concatenate([self._signatures, signatures])
+        self._scores = np.concatenate([self._scores, np.array(self._pending_scores, dtype=np.uint8)])
+        self._probabilities = np.concatenate(
+            [self._probabilities, np.array(self._pending_probabilities, dtype=np.float32)])
+        keys = signatures.reshape(len(signatures), BANDS, ROWS).astype('<u2').view('<u8')[:, :, 0]
+        entries = np.arange(first, first + len(signatures), dtype=np.int32)
+        for band in range(BANDS):
+            merged_keys = np.concatenate([self._band_sorted[band], keys[:, band]])
+            merged_entries = np.concatenate([self._band_entries[band], entries])
+            order = np.argsort(merged_keys, kind='stable')
+            self._band_sorted[band] = merged_keys[order]
+            self._band_entries[band] = merged_entries[order]
+        self._pending = [{} for _ in range(BANDS)]
+        self._pending_signatures, self._pending_scores, self._pending_probabilities = [], [], []
+        self._pending_count = 0
+
+    def _signature(self, entry):
+        merged = len(self._signatures)
+        return self._signatures[entry] if entry < merged else self._pending_signatures[entry - merged]
+
+    def _score(self, entry):
+        merged = len(self._scores)
+        return int(self._scores[entry] if entry < merged else self._pending_scores[entry - merged])
+
+    def _probability(self, entry):
+        merged = len(self._probabilities)
+        value = self._probabilities[entry] if entry < merged else self._pending_probabilities[entry - merged]
+        return None if value is None or np.isnan(value) else float(value)
+
+    def query(self, signature):
+        """
+        Return ``(entry, similarity)`` of the most similar indexed article at
+        or above the threshold, or None
+        """
+        candidates = set()
+        band_keys = _band_keys(signature)
+        for band in range(BANDS):
+            # Searching with a uint64 scalar avoids a slow Python int conversion
+            keys = self._band_sorted[band]
+            key = band_keys[band]
+            start = keys.searchsorted(key, 'left')
+            end = keys.searchsorted(key, 'right')
+            if end > start:
+                candidates.update(self._band_entries[band][start:end].tolist())
+        if self._pending_count:
+            for band, key in enumerate(band_keys.tolist()):
+                candidates.update(self._pending[band].get(key, ()))
+        best = None
+        for entry in candidates:
+            similarity = float(np.count_nonzero(self._signature(entry) == signature)) / NUM_PERM
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (entry, similarity)
+        return best
+
+    def describe(self, entry, similarity):
+        """
+        Return the ``near_duplicate_of`` annotation for a query hit
+        """
+        credibility_score = self._score(entry)
+        verdict, _ = verdict_for_score(credibility_score)
+        return {'id': self._ids[entry], 'similarity': round(similarity, 3),
+                'credibility_score': credibility_score, 'verdict': verdict,
+                'real_probability': self._probability(entry)}
+
+    def reused_result(self, entry, similarity):
+        """
+        Build an analysis result that reuses an indexed article's verdict
+        """
+        earlier = self.describe(entry, similarity)
+        verdict, summary = verdict_for_score(earlier['credibility_score'])
+        factors = [{'name': 'Near Duplicate', 'status': VERDICT_STATUS[verdict],
+                    'description': f"This content is {similarity:.0%} similar to article {earlier['id']}, which was already rated {verdict}."}]
+        result = {
+            'credibility_score': earlier['credibility_score'],
+            'verdict': verdict,
+            'factors': factors,
+            'summary': summary,
+            'near_duplicate_of': earlier
+        }
+        if earlier['real_probability'] is not None:
+            result['real_probability'] = earlier['real_probability']
+        return result
+
+    def save(self, path):
+        """
+        Write the index to a .npz file
+        """
+        self._merge()
+        # Ids are stored as their concatenated UTF-8 bytes plus each one's
+        # length, so any id (empty, or holding a newline) reads back as is
+        ids = [article_id.encode('utf-8') for article_id in self._ids]
+        arrays = {'signatures': self._signatures, 'scores': self._scores,
+                  'probabilities': self._probabilities,
+                  'ids': np.frombuffer(b''.join(ids), dtype=np.uint8),
+                  'id_lengths': np.array([len(article_id) for article_id in ids], dtype=np.int64),
+                  'threshold': np.array(self.threshold),
+                  'rules_version': np.array(self.rules_version or '')}
+        for band in range(BANDS):
+            arrays[f'band{band}_keys'] = self._band_sorted[band]
+            arrays[f'band{band}_entries'] = self._band_entries[band]
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path, threshold=None):
+        """
+        Read an index written by ``save``
+        """
+        with np.load(path) as data:
+            index = cls(float(data['threshold']) if threshold is None else threshold)
+            index.rules_version = str(data['rules_version']) if 'rules_version' in data else None
+            index._signatures = data['signatures']
+            index._scores = data['scores']
+            index._probabilities = data['probabilities']
+            ids = data['ids'].tobytes()
+            ends = np.cumsum(data['id_lengths']).tolist()
+            index._ids = [ids[start:end].decode('utf-8') for start, end in zip([0] + ends, ends)]
+            index._band_sorted = [data[f'band{band}_keys'] for band in range(BANDS)]
+            index._band_entries = [data[f'band{band}_entries'] for band in range(BANDS)]
+        return index
+
+
+def analyze_with_index(ids, texts, index, analyze, reuse=True):
+    """
+    Score a batch through a near-duplicate index.
+
+    ``analyze`` scores a list of texts. Articles that nearly duplicate an
+    indexed one reuse its verdict when ``reuse`` is set; otherwise they are
+    scored and annotated with ``near_duplicate_of``. Every scored article is
+    added to the index.
+    """
+    version = registry.current().version
+    if index.rules_version != version:
+        # Verdicts reached under other rules must not be reused
+        index.clear()
+        index.rules_version = version
+    results = [None] * len(texts)
+    signatures = [minhash_signature(text) for text in texts]
+    pending, hits = [], {}
+    for position, signature in enumerate(signatures):
+        hit = index.query(signature) if signature is not None else None
+        if hit is not None and reuse:
+            results[position] = index.reused_result(*hit)
+        else:
+            pending.append(position)
+            if hit is not None:
+                hits[position] = hit
+    if pending:
+        for position, result in zip(pending, analyze([texts[position] for position in pending])):
+            if position in hits:
+                result['near_duplicate_of'] = index.describe(*hits[position])
+            if signatures[position] is not None:
+                index.add(signatures[position], ids[position], result)
+            results[position] = result
+    return results
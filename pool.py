@@ -0,0 +1,231 @@
+"""
+Shared process pool that runs analyses off the Streamlit script threads.
+
+Regex matching and the sparse model hold the GIL, so running them on a
+session's script thread stalls every other session's reruns. The pool runs
+them in worker processes instead, each loading the model once, while the
+script thread only waits on a future. At most ``max_pending`` analyses may be
+queued or running; beyond that ``submit`` waits up to ``queue_timeout``
+seconds for a slot and then raises PoolBusy, so a burst of users gets a
+clear "busy" answer instead of an ever-growing queue and latency. An
+analysis that takes longer than ``result_timeout`` also raises PoolBusy, and
+a worker that dies (killed for running out of memory, say) is replaced
+along with its pool instead of failing every later analysis.
+
+    FAKE_NEWS_WORKERS         worker processes (default: CPU count, 0 runs inline)
+    FAKE_NEWS_MAX_PENDING     queued + running analyses (default: 4 per worker)
+    FAKE_NEWS_QUEUE_TIMEOUT   seconds to wait for a free slot (default: 2)
+    FAKE_NEWS_RESULT_TIMEOUT  seconds to wait for a result (default: 60)
+    FAKE_NEWS_WARM_UP         1 to start and warm the workers as soon as the
+                              pool is created (default), 0 to wait for the
+                              first analysis
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import collect_trace, record
+
+ANALYSES = ('heuristic', 'model', 'hybrid')
+
+# Number of top_features each analysis adds to its result, which callers
+# caching the results must key them by
+RESULT_TOP_K = {'heuristic': 0, 'model': 10, 'hybrid': 10}
+
+# Scored once per kind by warm_up so the first real request finds the model
+# loaded, the rules compiled and every code path already exercised
+WARM_UP_TEXT = ('WASHINGTON (Reuters) - Officials said on Tuesday that the report, '
+                'according to a study published in March, shows 45% of voters agree. '
+                "However, critics say you won't believe what happens next!")
+
+
+class PoolBusy(Exception):
+    """
+    Raised when the pool's queue stays full for longer than the queue timeout,
+    or an analysis does not finish within the result timeout
+    """
+
+
+def run_analysis(kind, text):
+    """
+    Run one analysis and return ``(result, trace)``; executed in the workers
+    """
+    with collect_trace() as trace:
+        if kind == 'heuristic':
+            from analysis import advanced_fake_news_analysis
+            result = advanced_fake_news_analysis(text)
+        elif kind == 'model':
+            from inference import model_fake_news_analysis
+            result = model_fake_news_analysis(text, k=RESULT_TOP_K[kind])
+        elif kind == 'hybrid':
+            from inference import hybrid_fake_news_analysis
+            result = hybrid_fake_news_analysis(text, k=RESULT_TOP_K[kind])
+        else:
+            raise ValueError(f'Unknown analysis {kind!r}')
+    return result, trace
+
+
+def _warm_up(load_model):
+    """
+    Worker initializer: import the analysis code and optionally load the model
+    """
+    import analysis  # noqa: F401
+    if load_model:
+        from inference import load_model as load
+        load()
+
+
+def warm_up_worker(load_model=True):
+    """
+    Load everything an analysis needs and run each kind once. Returns the
+    seconds it took.
+    """
+    started = time.perf_counter()
+    _warm_up(load_model)
+    for kind in ANALYSES if load_model else ('heuristic',):
+        run_analysis(kind, WARM_UP_TEXT)
+    return time.perf_counter() - started
+
+
+class AnalysisPool:
+    """
+    Bounded process pool for analyses, shared by every session of a server
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, queue_timeout=2.0, load_model=True,
+                 result_timeout=60.0):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_pending = max_pending or max(1, self.max_workers) * 4
+        self.queue_timeout = queue_timeout
+        self.result_timeout = result_timeout
+        self.load_model = load_model
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._warming = None
+        self._executor = self._start_executor() if self.max_workers else None
+        self._lock = threading.Lock()
+
+    def _start_executor(self):
+        # Spawned workers do not inherit the server's threads and locks
+        return ProcessPoolExecutor(
+            self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm_up, initargs=(self.load_model,))
+
+    def _replace_broken(self, executor):
+        """
+        Replace ``executor`` once a worker has died, which fails every task
+        it holds; callers that saw the same failure replace it only once
+        """
+        with self._lock:
+            if self._executor is executor:
+                print('An analysis worker died; restarting the pool', file=sys.stderr)
+                # A worker started by a submit racing the pool's teardown is
+                # not terminated by it, and would keep the interpreter from
+                # exiting
+                processes = list((getattr(executor, '_processes', None) or {}).values())
+                executor.shutdown(wait=False, cancel_futures=True)
+                for process in processes:
+                    process.terminate()
+                self._executor = self._start_executor()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a pool sized by the FAKE_NEWS_* environment variables
+        """
+        workers = os.environ.get('FAKE_NEWS_WORKERS')
+        pending = os.environ.get('FAKE_NEWS_MAX_PENDING')
+        pool = cls(int(workers) if workers else None, int(pending) if pending else None,
+                   float(os.environ.get('FAKE_NEWS_QUEUE_TIMEOUT', 2.0)),
+                   result_timeout=float(os.environ.get('FAKE_NEWS_RESULT_TIMEOUT', 60.0)))
+        if os.environ.get('FAKE_NEWS_WARM_UP', '1') != '0':
+            pool.warm_up()
+        return pool
+
+    def warm_up(self):
+        """
+        Start every worker and warm it up in the background; returns a list
+        of futures of the seconds each warm-up took. Without workers the
+        warm-up runs on a thread, and inline analyses wait for it instead of
+        loading the model a second time.
+        """
+        if self._executor is None:
+            future = self._warming = Future()
+
+            def run():
+                try:
+                    future.set_result(warm_up_worker(self.load_model))
+                except Exception as exc:
+                    future.set_exception(exc)
+
+            threading.Thread(target=run, name='analysis-warm-up', daemon=True).start()
+            return [future]
+        # Tasks submitted while no worker is idle each start a new worker
+        return [self._executor.submit(warm_up_worker, self.load_model) for _ in range(self.max_workers)]
+
+    def submit(self, kind, text):
+        """
+        Queue an analysis and return a Future of ``(result, trace)``.
+        Raises PoolBusy if no slot frees up within the queue timeout.
+        """
+        if kind not in ANALYSES:
+            raise ValueError(f'Unknown analysis {kind!r}')
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PoolBusy(f'{self.max_pending} analyses are already queued')
+        try:
+            if self._executor is None:
+                if self._warming is not None:
+                    wait([self._warming])
+                future = Future()
+                try:
+                    future.set_result(run_analysis(kind, text))
+                except Exception as exc:
+                    future.set_exception(exc)
+            else:
+                executor = self._executor
+                try:
+                    future = executor.submit(run_analysis, kind, text)
+                except Exception:
+                    # Besides BrokenProcessPool, a pool caught tearing itself
+                    # down fails with OSError or ValueError, and one already
+                    # replaced by another caller with RuntimeError
+                    self._replace_broken(executor)
+                    future = self._executor.submit(run_analysis, kind, text)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def analyze(self, kind, text, timeout=None):
+        """
+        Run an analysis in the pool and wait up to ``timeout`` seconds
+        (default ``result_timeout``) for its result, raising PoolBusy after
+        that. An analysis lost with a dead worker is retried once on the
+        replacement pool. The worker's stage timings are recorded in this
+        process's metrics and trace.
+        """
+        timeout = self.result_timeout if timeout is None else timeout
+        for attempt in range(2):
+            executor = self._executor
+            future = self.submit(kind, text)
+            try:
+                result, trace = future.result(timeout)
+                break
+            except TimeoutError:
+                future.cancel()
+                raise PoolBusy(f'The analysis did not finish within {timeout} seconds') from None
+            except BrokenProcessPool:
+                self._replace_broken(executor)
+                if attempt:
+                    raise
+        for stage, milliseconds in trace.items():
+            record(stage, milliseconds / 1000)
+        return result
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,72 @@
+"""
+Text preprocessing shared by model training (app.ipynb) and inference.
+
+The notebook's original clean_text ran eight re.sub passes, but once ``\W``
+has turned every non-word character into a space the URL, HTML, newline
+and most of the punctuation passes can no longer match. What is left is
+fused here into passes with identical output:
+
+    lower -> drop [bracketed] spans -> non-word chars to spaces, drop '_'
+          -> drop words containing a digit
+"""
+import re
+
+BRACKETED = re.compile(r'\[.*?\]')
+DIGIT = re.compile(r'\d')
+WORD_TAIL = re.compile(r'\w*')
+
+# ASCII non-word characters become spaces and '_' is dropped through one
+# str.translate; only non-ASCII characters still need the regex
+ASCII_NON_WORD = str.maketrans(
+    {chr(code): ' ' for code in range(128) if not re.match(r'\w', chr(code))}
+    | {'_': None}
+)
+NON_ASCII_NON_WORD = re.compile(r'[^\w\x00-\x7f]')
+
+
+def _drop_digit_words(text):
+    """
+    Remove every word containing a digit, like re.sub(r'\\w*\\d\\w*', '', text),
+    from text whose words are separated by spaces
+    """
+    pieces = []
+    last = 0
+    match = DIGIT.search(text)
+    while match is not None:
+        position = match.start()
+        start = text.rfind(' ', last, position) + 1
+        end = WORD_TAIL.match(text, position).end()
+        pieces.append(text[last:start])
+        last = end
+        match = DIGIT.search(text, end)
+    pieces.append(text[last:])
+    return ''.join(pieces)
+
+
+def clean_text(text):
+    """
+    Normalize an article the same way the training notebook does
+    """
+    text = BRACKETED.sub("", text.lower()).translate(ASCII_NON_WORD)
+    if not text.isascii():
+        text = NON_ASCII_NON_WORD.sub(" ", text)
+    return _drop_digit_words(text)
+
+
+def clean_texts(texts):
+    """
+    Clean a whole column of articles (list, pandas Series or Arrow array).
+
+    Returns a list, or a Series with the same index when given a Series.
+    """
+    index = getattr(texts, 'index', None)
+    name = getattr(texts, 'name', None)
+    if hasattr(texts, 'to_pylist'):
+        texts = texts.to_pylist()
+
+    cleaned = [clean_text(text) for text in texts]
+
+    if index is not None and not callable(index):
+        import pandas as pd
+        return pd.Series(cleaned, index=index, name=name)
+    return cleaned
@@ -0,0 +1,321 @@
+"""
+Declarative heuristic rules, compiled once and reloaded when their file changes.
+
+The rule file (rules.json by default, or FAKE_NEWS_RULES) declares:
+
+``categories``
+    Named pattern lists. Each counts how many of its patterns occur in the
+    lowercased text, or in the raw text with ``"case_sensitive": true``.
+``metrics``
+    Derived values computed, in order, from the category counts and the
+    built-in ``words`` and ``sentences`` counts.
+``factors``
+    One entry per factor card. Its ``rules`` are tried in order and the first
+    whose ``when`` expression holds (the last rule has no ``when``) gives the
+    card's status, description and score delta. Descriptions may reference
+    any count or metric, e.g. ``"Contains {clickbait} clickbait phrases."``
+
+Expressions are plain arithmetic and comparisons over those names, with
+``and``/``or``/``not`` and ``x if condition else y``.
+
+Every compiled rule set has a ``version``, a hash of its content that is the
+same in every process. Cached results are keyed by it, so they stop being
+served as soon as an edit is picked up.
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import string
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from matcher import MAX_CACHED_CHARS, PatternMatcher, SegmentCounter, TextCache, split_segments
+from metrics import StageTimer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.environ.get('FAKE_NEWS_RULES', os.path.join(BASE_DIR, 'rules.json'))
+
+# Seconds between checks of the rule file's modification time
+RELOAD_INTERVAL = 2.0
+
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+')
+BUILTIN_METRICS = ('words', 'sentences')
+STATUSES = ('pass', 'warning', 'fail')
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Constant, ast.BinOp, ast.UnaryOp,
+    ast.BoolOp, ast.Compare, ast.IfExp, ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.FloorDiv, ast.Mod, ast.USub, ast.UAdd, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+class RuleError(ValueError):
+    """
+    Raised when a rule file is malformed
+    """
+
+
+class _MetricLookup(ast.NodeTransformer):
+    """
+    Rewrites every name ``x`` into ``m['x']``
+    """
+
+    def visit_Name(self, node):
+        return ast.copy_location(
+            ast.Subscript(value=ast.Name(id='m', ctx=ast.Load()), slice=ast.Constant(node.id), ctx=ast.Load()),
+            node)
+
+
+def compile_expression(source, names):
+    """
+    Compile a rule expression into a function of the metrics dict, allowing
+    only arithmetic, comparisons and the given names
+    """
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as exc:
+        raise RuleError(f'Invalid expression {source!r}: {exc.msg}') from None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise RuleError(f'Unsupported syntax in {source!r}: {type(node).__name__}')
+        if isinstance(node, ast.Name) and node.id not in names:
+            raise RuleError(f'Unknown name {node.id!r} in {source!r}')
+    body = _MetricLookup().visit(tree.body)
+    function = ast.Expression(ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg('m')], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=body))
+    ast.fix_missing_locations(function)
+    return eval(compile(function, f'<rule {source}>', 'eval'), {'__builtins__': {}})
+
+
+class RuleSet:
+    """
+    A rule file compiled into pattern matchers and rule functions
+    """
+
+    def __init__(self, spec):
+        self.version = hashlib.blake2b(json.dumps(spec, sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+        try:
+            self.base_score = spec.get('base_score', 50)
+            lowercase, case_sensitive = {}, {}
+            for name, category in spec['categories'].items():
+                target = case_sensitive if category.get('case_sensitive') else lowercase
+                target[name] = list(category['patterns'])
+            for patterns in (*lowercase.values(), *case_sensitive.values()):
+                for pattern in patterns:
+                    re.compile(pattern)
+            self.text_matcher = PatternMatcher(lowercase) if lowercase else None
+            self.case_sensitive_matcher = PatternMatcher(case_sensitive) if case_sensitive else None
+
+            names = set(spec['categories']) | set(BUILTIN_METRICS)
+            self.metrics = []
+            for name, source in spec.get('metrics', {}).items():
+                self.metrics.append((name, compile_expression(source, names)))
+                names.add(name)
+
+            self.factors = []
+            for factor in spec['factors']:
+                rules = []
+                for rule in factor['rules']:
+                    if rule['status'] not in STATUSES:
+                        raise RuleError(f"Unknown status {rule['status']!r} in factor {factor['id']!r}")
+                    for _, field, _, _ in string.Formatter().parse(rule['description']):
+                        if field and field not in names:
+                            raise RuleError(f"Unknown name {field!r} in a description of factor {factor['id']!r}")
+                    when = compile_expression(rule['when'], names) if 'when' in rule else None
+                    rules.append((when, rule.get('name', factor['name']), rule['status'],
+                                  rule['score'], rule['description']))
+                if rules[-1][0] is not None:
+                    raise RuleError(f"The last rule of factor {factor['id']!r} must not have a 'when'")
+                self.factors.append((factor['id'], rules))
+        except (KeyError, TypeError, AttributeError, IndexError, re.error) as exc:
+            raise RuleError(f'Malformed rule file: {exc!r}') from None
+
+    def evaluate(self, text):
+        """
+        Return ``(factors, total_score)`` for an article, before clamping
+        """
+        timer = StageTimer('heuristics.')
+        metrics = self.text_matcher.count(text.lower()) if self.text_matcher else {}
+        timer.lap('pattern_scan')
+        if self.case_sensitive_matcher:
+            metrics.update(self.case_sensitive_matcher.count(text))
+        timer.lap('case_sensitive_scan')
+        metrics['words'] = len(text.split())
+        metrics['sentences'] = sum(1 for _ in SENTENCE_BOUNDARY.finditer(text)) + 1
+        return self._score(metrics, timer)
+
+    def evaluate_stream(self, chunks, overlap=64 * 1024):
+        """
+        Like ``evaluate`` over the concatenation of ``chunks``, holding only
+        about one chunk plus ``overlap`` characters in memory at a time
+        """
+        timer = StageTimer('heuristics.')
+        text_counter = self.text_matcher.stream(overlap) if self.text_matcher else None
+        case_sensitive_counter = self.case_sensitive_matcher.stream(overlap) if self.case_sensitive_matcher else None
+        words = sentences = 0
+        previous = ''
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if text_counter:
+                text_counter.feed(chunk.lower())
+            if case_sensitive_counter:
+                case_sensitive_counter.feed(chunk)
+            # A word or run of sentence punctuation cut by the chunk boundary
+            # is counted in both chunks
+            words += len(chunk.split())
+            if previous and not previous[-1].isspace() and not chunk[0].isspace():
+                words -= 1
+            sentences += sum(1 for _ in SENTENCE_BOUNDARY.finditer(chunk))
+            if previous and previous[-1] in '.!?' and chunk[0] in '.!?':
+                sentences -= 1
+            previous = chunk
+        metrics = text_counter.counts() if text_counter else {}
+        if case_sensitive_counter:
+            metrics.update(case_sensitive_counter.counts())
+        timer.lap('stream_scan')
+        metrics['words'] = words
+        metrics['sentences'] = sentences + 1
+        return self._score(metrics, timer)
+
+    def _score(self, metrics, timer):
+        """
+        Apply the derived metrics and factor rules to an article's counts
+        """
+        for name, function in self.metrics:
+            metrics[name] = function(metrics)
+        timer.lap('text_stats')
+
+        factors = []
+        total_score = self.base_score
+        for factor_id, rules in self.factors:
+            for when, name, status, score, description in rules:
+                if when is None or when(metrics):
+                    factors.append({'name': name, 'status': status,
+                                    'description': description.format_map(metrics)})
+                    total_score += score
+                    break
+            timer.lap(factor_id)
+        return factors, total_score
+
+
+class LiveEvaluator:
+    """
+    Evaluates successive versions of a text being edited with one RuleSet.
+    Pattern matches, words and sentences are cached per sentence and
+    paragraph (see matcher.SegmentCounter), so a new version only scans the
+    segments that changed and the ones a match could span with them, and
+    the result equals ``evaluate`` of the whole text.
+    """
+
+    def __init__(self, rules, max_cached_chars=MAX_CACHED_CHARS):
+        self.rules = rules
+        self.max_cached_chars = max_cached_chars
+        self._text_counter = SegmentCounter(rules.text_matcher, max_cached_chars) \
+            if rules.text_matcher else None
+        self._case_sensitive_counter = SegmentCounter(rules.case_sensitive_matcher, max_cached_chars) \
+            if rules.case_sensitive_matcher else None
+        self._segment_stats = TextCache(max_cached_chars)   # segment -> (words, sentence punctuation runs)
+
+    def evaluate(self, text):
+        """
+        Return ``(factors, total_score)`` for the current version of the text
+        """
+        timer = StageTimer('heuristics.')
+        metrics = self._text_counter.count(text.lower()) if self._text_counter else {}
+        timer.lap('pattern_scan')
+        if self._case_sensitive_counter:
+            metrics.update(self._case_sensitive_counter.count(text))
+        timer.lap('case_sensitive_scan')
+        # Neither words nor runs of sentence punctuation span a cut between
+        # segments
+        segments = split_segments(text)
+        self._segment_stats.max_chars = max(self.max_cached_chars, 2 * len(text))
+        words = sentences = 0
+        for segment in segments:
+            segment_words, segment_sentences = self._stats(segment, cache=len(segments) > 1)
+            words += segment_words
+            sentences += segment_sentences
+        self._segment_stats.evict()
+        metrics['words'] = words
+        metrics['sentences'] = sentences + 1
+        return self.rules._score(metrics, timer)
+
+    def _stats(self, segment, cache=True):
+        stats = self._segment_stats.get(segment)
+        if stats is not None:
+            self._segment_stats.move_to_end(segment)
+        else:
+            stats = (len(segment.split()), sum(1 for _ in SENTENCE_BOUNDARY.finditer(segment)))
+            if cache:
+                self._segment_stats.put(segment, stats)
+        return stats
+
+
+def load_rules(path=RULES_PATH):
+    """
+    Read and compile a rule file
+    """
+    with open(path, encoding='utf-8') as f:
+        try:
+            spec = json.load(f)
+        except ValueError as exc:
+            raise RuleError(f'{path} is not valid JSON: {exc}') from None
+    return RuleSet(spec)
+
+
+class RuleRegistry:
+    """
+    Holds the compiled rules of one file and recompiles them when the file's
+    modification time changes. A broken edit is reported and the previous
+    rules stay in use.
+    """
+
+    def __init__(self, path=RULES_PATH, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self._rules = load_rules(path)
+        self._checked = time.monotonic()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self):
+        """
+        Return the compiled rules, reloading them first if the file changed
+        """
+        if time.monotonic() - self._checked >= self.reload_interval:
+            self.reload()
+        return self._rules
+
+    def reload(self, force=False):
+        """
+        Recompile the rules if the file changed (or ``force``); returns True
+        when new rules were installed
+        """
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stamp = self._file_stamp()
+                if stamp == self._stamp and not force:
+                    return False
+                # Remember the stamp even if this version fails to compile, so
+                # it is reported once rather than on every check
+                self._stamp = stamp
+                self._rules = load_rules(self.path)
+            except (OSError, RuleError) as exc:
+                print(f'Keeping the previous rules: {exc}', file=sys.stderr)
+                return False
+            return True
+
+
+registry = RuleRegistry()
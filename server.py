@@ -0,0 +1,218 @@
+"""
+Headless HTTP/JSON inference service, independent of the Streamlit UI.
+
+    python server.py --port 8000
+
+Endpoints:
+    GET  /health           -> {"status": "ok", "cache": {...hit/miss counts}}
+    POST /analyze          {"text": "...", "mode": "heuristic" | "model" | "hybrid"}
+    POST /analyze/batch    {"texts": ["...", ...], "mode": "heuristic" | "model" | "hybrid"}
+    GET  /metrics          per-stage latency histograms, Prometheus text format
+
+Add ``"trace": true`` to a request to get the stage timings of its batch
+back under ``trace`` in each result.
+
+Concurrent requests are micro-batched so the model runs once per batch.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import result_cache
+from inference import analyze_batch, load_model
+from metrics import CONTENT_TYPE, collect_trace, stage_metrics, timed
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+# analyze_batch options for each request mode
+MODES = {'heuristic': {}, 'model': {'heuristics': False}, 'hybrid': {'hybrid': True}}
+
+
+class MicroBatcher:
+    """
+    Collects texts submitted from many threads and scores them together
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, texts, mode='heuristic', trace=False):
+        """
+        Queue texts for scoring and return a Future of their result dicts
+        """
+        future = Future()
+        self._queue.put((list(texts), mode, trace, future))
+        return future
+
+    def _collect(self):
+        """
+        Block for the first request, then gather more until the batch is full
+        or the wait budget runs out
+        """
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            for mode, options in MODES.items():
+                items = [item for item in batch if item[1] == mode]
+                if not items:
+                    continue
+                texts = [text for item_texts, _, _, _ in items for text in item_texts]
+                try:
+                    with collect_trace() as trace, timed('server.batch'):
+                        results = analyze_batch(texts, self.model, **options)
+                except Exception as exc:
+                    for _, _, _, future in items:
+                        future.set_exception(exc)
+                    continue
+                offset = 0
+                for item_texts, _, wants_trace, future in items:
+                    item_results = results[offset:offset + len(item_texts)]
+                    if wants_trace:
+                        for result in item_results:
+                            result['trace'] = {'batch_size': len(texts), **trace}
+                    future.set_result(item_results)
+                    offset += len(item_texts)
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    """
+    JSON request handler backed by the server's MicroBatcher
+    """
+
+    # Keep-alive lets clients reuse connections across requests
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'cache': result_cache.stats()})
+        elif self.path == '/metrics':
+            data = stage_metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path not in ('/analyze', '/analyze/batch'):
+            # The unread body would corrupt the next request on this connection
+            self.close_connection = True
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Without a usable length the body cannot be skipped either
+            self.close_connection = True
+            self._send_json(400, {'error': 'Invalid request: missing or invalid Content-Length'})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': 'Request body too large'})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            mode = payload.get('mode', 'heuristic')
+            if mode not in MODES:
+                raise ValueError(f'unknown mode {mode!r}')
+            if self.path == '/analyze':
+                texts = [payload['text']]
+            else:
+                texts = payload['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise TypeError('texts must be a list of strings')
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            self._send_json(400, {'error': f'Invalid request: {exc}'})
+            return
+
+        try:
+            results = self.server.batcher.submit(texts, mode, bool(payload.get('trace'))).result()
+        except Exception as exc:
+            self._send_json(500, {'error': str(exc)})
+            return
+
+        if self.path == '/analyze':
+            self._send_json(200, results[0])
+        else:
+            self._send_json(200, {'results': results})
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Per-request access logs are too noisy at crawler volume
+        pass
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """
+    Thread-per-connection server sharing one MicroBatcher
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, batcher):
+        super().__init__(address, AnalysisHandler)
+        self.batcher = batcher
+
+
+def make_server(host='127.0.0.1', port=8000, max_batch_size=64, max_wait_ms=5.0):
+    """
+    Create the HTTP server with the model loaded and a micro-batcher running
+    """
+    return AnalysisServer((host, port), MicroBatcher(load_model(), max_batch_size, max_wait_ms))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve fake news analysis over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=64, help='texts scored per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help='time to wait for a batch to fill')
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.max_batch_size, args.max_wait_ms)
+    print(f'Serving on http://{args.host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
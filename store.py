@@ -0,0 +1,225 @@
+"""
+Persistent SQLite store of every analysis result.
+
+``record`` only queues the result; a background thread writes queued results
+in batches, one transaction each, so the request path never waits on disk.
+The database runs in WAL mode so readers are never blocked by that writer.
+Each row holds the content hash, kind of analysis, score, verdict, factor
+statuses, model probability and timestamp, indexed for lookups by hash,
+time range and verdict. Per-kind, per-verdict counts and score sums are
+updated in the same transaction as the inserts, so the app's stats cards
+read a handful of aggregate rows instead of scanning the table.
+
+    FAKE_NEWS_STORE  database file (default: results.db next to this module,
+                     empty to disable recording)
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from cache import content_hash
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_PATH = os.environ.get('FAKE_NEWS_STORE', os.path.join(BASE_DIR, 'results.db'))
+
+# Seconds the writer waits for more results before committing a batch
+FLUSH_INTERVAL = 0.5
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    credibility_score INTEGER NOT NULL,
+    verdict TEXT NOT NULL,
+    factors TEXT NOT NULL,
+    real_probability REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_content_hash ON results (content_hash);
+CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);
+CREATE INDEX IF NOT EXISTS results_verdict_created_at ON results (verdict, created_at);
+CREATE TABLE IF NOT EXISTS aggregates (
+    kind TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    articles INTEGER NOT NULL,
+    score_sum INTEGER NOT NULL,
+    PRIMARY KEY (kind, verdict)
+);
+'''
+
+_INSERT = '''
+INSERT INTO results (content_hash, kind, credibility_score, verdict, factors, real_probability, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+_UPDATE_AGGREGATE = '''
+INSERT INTO aggregates (kind, verdict, articles, score_sum) VALUES (?, ?, ?, ?)
+ON CONFLICT (kind, verdict) DO UPDATE SET
+    articles = articles + excluded.articles,
+    score_sum = score_sum + excluded.score_sum
+'''
+
+_STOP = object()
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    # Durable across application crashes; WAL only risks the last commits on power loss
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def _record(row):
+    """
+    Turn a results row into a dict with its factor statuses decoded
+    """
+    record = dict(row)
+    record['factors'] = json.loads(record['factors'])
+    return record
+
+
+class ResultStore:
+    """
+    Append-only result history with a batching background writer
+    """
+
+    def __init__(self, path=STORE_PATH, flush_interval=FLUSH_INTERVAL, batch_size=500, max_queued=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(max_queued)
+        self._local = threading.local()
+        connection = _connect(path)
+        connection.executescript(SCHEMA)
+        connection.close()
+        self._writer = threading.Thread(target=self._write_loop, name='result-store-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, kind, text, result):
+        """
+        Queue a result for writing without blocking. When the writer has
+        fallen ``max_queued`` results behind, the result is dropped and
+        counted in ``dropped``.
+        """
+        factors = {factor['name']: factor['status'] for factor in result['factors']}
+        row = (content_hash(text), kind, result['credibility_score'], result['verdict'],
+               json.dumps(factors), result.get('real_probability'), time.time())
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        connection = _connect(self.path)
+        stopping = False
+        while not stopping:
+            rows = [self._queue.get()]
+            # Linger briefly so a burst of results shares one transaction
+            deadline = time.monotonic() + self.flush_interval
+            while rows[-1] is not _STOP and len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if rows[-1] is _STOP:
+                stopping = True
+                rows.pop()
+            try:
+                if rows:
+                    self._write(connection, rows)
+            except sqlite3.Error as exc:
+                print(f'Could not store {len(rows)} results: {exc}', file=sys.stderr)
+            finally:
+                for _ in range(len(rows) + stopping):
+                    self._queue.task_done()
+        connection.close()
+
+    @staticmethod
+    def _write(connection, rows):
+        """
+        Insert a batch of rows and fold it into the aggregates in one transaction
+        """
+        totals = {}
+        for _, kind, score, verdict, _, _, _ in rows:
+            articles, score_sum = totals.get((kind, verdict), (0, 0))
+            totals[kind, verdict] = (articles + 1, score_sum + score)
+        with connection:
+            connection.executemany(_INSERT, rows)
+            connection.executemany(_UPDATE_AGGREGATE, [(*key, *value) for key, value in totals.items()])
+
+    def flush(self):
+        """
+        Block until every queued result has been written
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Write the queued results and stop the writer thread
+        """
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def _reader(self):
+        """
+        Return this thread's read connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = _connect(self.path)
+        return connection
+
+    def stats(self):
+        """
+        Return the number of stored articles, their mean score and the count
+        per verdict, from the aggregate rows
+        """
+        rows = self._reader().execute(
+            'SELECT verdict, SUM(articles), SUM(score_sum) FROM aggregates GROUP BY verdict').fetchall()
+        articles = sum(row[1] for row in rows)
+        return {
+            'articles': articles,
+            'mean_score': sum(row[2] for row in rows) / articles if articles else None,
+            'verdicts': {row[0]: row[1] for row in rows}
+        }
+
+    def lookup(self, text=None, digest=None):
+        """
+        Return every stored result for an article, newest first, by its text
+        or its content hash
+        """
+        digest = digest or content_hash(text)
+        rows = self._reader().execute(
+            'SELECT * FROM results WHERE content_hash = ? ORDER BY created_at DESC', (digest,)).fetchall()
+        return [_record(row) for row in rows]
+
+    def history(self, since=None, until=None, verdict=None, limit=100):
+        """
+        Return stored results in a time range (Unix timestamps), optionally
+        of one verdict, newest first
+        """
+        clauses, parameters = [], []
+        if verdict is not None:
+            clauses.append('verdict = ?')
+            parameters.append(verdict)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            parameters.append(since)
+        if until is not None:
+            clauses.append('created_at < ?')
+            parameters.append(until)
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        rows = self._reader().execute(
+            f'SELECT * FROM results {where} ORDER BY created_at DESC LIMIT ?', (*parameters, limit)).fetchall()
+        return [_record(row) for row in rows]
@@ -0,0 +1,119 @@
+"""
+Fetching against a local stub server: size cap, deadline, charsets, the
+paragraph extractor and per-URL errors.
+"""
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetch import FetchError, download, fetch_article, fetch_articles
+
+ARTICLE = (b'<html><head><title>Budget vote</title></head><body>'
+           b'<nav><p>Home | World</nav>'
+           b'<p>The council approved the budget on Tuesday.</p>'
+           b'<p>Officials said spending rises by two percent.'
+           b'<div class="related">Related</div>'
+           b'<p>The vote was <b>seven</b> to two.'
+           b'</body></html>')
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/article':
+            self._send(ARTICLE)
+        elif self.path == '/empty':
+            self._send(b'<html><body></body></html>')
+        elif self.path == '/charset':
+            self._send('<p>Café owners said so.</p>'.encode('utf-8'), 'text/html; charset=utf8mb4')
+        elif self.path == '/large':
+            self._send(b'<p>' + b'x' * 5000 + b'</p>')
+        elif self.path == '/large-undeclared':
+            # No Content-Length: the body ends when the connection closes
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(b'<p>' + b'x' * 5000 + b'</p>')
+            self.close_connection = True
+        elif self.path == '/trickle':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', '1000')
+            self.end_headers()
+            try:
+                for _ in range(1000):
+                    self.wfile.write(b'x')
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except OSError:
+                pass
+        else:
+            self.send_error(404)
+
+    def _send(self, body, content_type='text/html'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def without_newspaper(monkeypatch):
+    # Importing a module set to None raises ImportError
+    monkeypatch.setitem(sys.modules, 'newspaper', None)
+
+
+@pytest.mark.parametrize('path', ['/large', '/large-undeclared'])
+def test_size_cap(server, path):
+    with pytest.raises(FetchError, match='larger than 1000 bytes'):
+        download(server + path, max_bytes=1000)
+
+
+def test_deadline_stops_a_trickling_server(server):
+    started = time.monotonic()
+    with pytest.raises(FetchError, match='too long'):
+        download(server + '/trickle', max_seconds=0.5)
+    assert time.monotonic() - started < 5
+
+
+def test_unknown_charset_falls_back_to_utf8(server):
+    assert 'Café' in download(server + '/charset')
+
+
+def test_paragraph_extractor(server, without_newspaper):
+    article = fetch_article(server + '/article')
+    assert article['title'] == 'Budget vote'
+    assert article['text'].split('\n\n') == [
+        'The council approved the budget on Tuesday.',
+        'Officials said spending rises by two percent.',
+        'The vote was seven to two.',
+    ]
+
+
+def test_errors_are_kept_per_url(server, without_newspaper):
+    paths = ['/article', '/missing', '/empty', '/charset', '/article']
+    results = list(fetch_articles((server + path for path in paths), max_workers=2, max_pending=2))
+    assert [url for url, _, _ in results] == [server + path for path in paths]
+    assert [article is None for _, article, _ in results] == [False, True, True, False, False]
+    assert '404' in results[1][2]
+    assert 'No article text' in results[2][2]
+    assert results[0][2] is None and results[4][1] == results[0][1]
@@ -0,0 +1,75 @@
+"""
+LiveAnalysis must give the same result as a full analysis of the same text.
+"""
+import random
+
+import pytest
+
+from analysis import LiveAnalysis, advanced_fake_news_analysis
+from matcher import crossing_reach
+from rules import LiveEvaluator, registry
+
+
+@pytest.mark.parametrize('text', [
+    # A \s+ crossing blank lines longer than any fixed seam window
+    'wake\n' + (' ' * 100 + '\n') * 3 + 'up sheeple',
+    'this\n\t \none\n' + ' ' * 90 + '\ntrick',
+    "they\n don't \n  want\n you\n\n to\n   know",
+    'january\n' + ' ' * 80 + '\n12,\n\n' + ' ' * 70 + '\n2020',
+])
+def test_matches_across_lines_equal_full_analysis(text):
+    assert LiveAnalysis().analyze(text) == advanced_fake_news_analysis(text)
+
+
+def test_edits_equal_full_analysis():
+    rng = random.Random(0)
+    pieces = ['wake', 'up', 'sheeple', 'deep', 'state', 'this', 'one', 'trick', 'SHOCKING', '!!!',
+              'reuters', 'march', '3,', '2020', ' ', '\n', '\n\n', ' ' * 120 + '\n']
+    text = ' '.join(rng.choice(pieces) for _ in range(300))
+    live = LiveAnalysis()
+    for _ in range(100):
+        assert live.analyze(text) == advanced_fake_news_analysis(text)
+        position = rng.randrange(len(text) + 1)
+        text = text[:position] + rng.choice(pieces) + text[position + rng.randint(0, 20):]
+
+
+@pytest.mark.parametrize('pattern, reach', [
+    (r'\bwake\s+up\b.*\bsheeple\b', 0),
+    (r'\bthis\s+one\s+trick\b', 1),
+    (r'\b(january|march)\s+\d+,?\s+\d{4}\b', 1),
+    (r'\bthey\s+don\'t\s+want\s+you\s+to\s+know\b', 4),
+    (r'\baccording to (dr\.|professor|expert)\b', 1),
+    (r'\bthe new york times\b', 2),
+    (r'a\W+b\s+c', None),
+])
+def test_crossing_reach(pattern, reach):
+    assert crossing_reach(pattern) == reach
+
+
+def test_single_paragraph_equals_full_analysis():
+    sentence = 'Officials said on Tuesday that the report was published in March. '
+    text = (sentence * 40 + 'Wake up sheeple. ' + sentence * 40 + 'They don\'t want you. To know! '
+            + sentence * 40 + 'The deep state. ' + sentence * 40)
+    rng = random.Random(1)
+    pieces = ['wake up', 'sheeple', '. ', '! ', 'this one trick', 'deep', 'state', 'secret.', 'revealed', ' ']
+    live = LiveAnalysis()
+    for _ in range(50):
+        assert live.analyze(text) == advanced_fake_news_analysis(text)
+        position = rng.randrange(len(text) + 1)
+        text = text[:position] + rng.choice(pieces) + text[position + rng.randint(0, 10):]
+
+
+def test_caches_are_bounded_by_size():
+    sentence = 'Officials said on Tuesday that the report was published in March. '
+    text = sentence * 1000
+    evaluator = LiveEvaluator(registry.current(), max_cached_chars=1000)
+    for position in range(0, 300 * 200, 200):
+        text = text[:position] + 'x' + text[position:]
+        evaluator.evaluate(text)
+        counters = [evaluator._text_counter, evaluator._case_sensitive_counter]
+        caches = [counter._cache for counter in counters if counter] + [evaluator._segment_stats]
+        for cache in caches:
+            # Windows add up to at most max_growth (4) times the text, and
+            # twice the current version's are kept, however many edits came before
+            assert cache.chars == sum(map(len, cache)) <= 8 * len(text)
+            assert text not in cache and text.lower() not in cache
@@ -0,0 +1,348 @@
+"""
+Streaming training for the TF-IDF + logistic regression model.
+
+    python train.py --fake Fake.csv --true True.csv --jobs 8
+
+Reproduces the notebook's pipeline without loading the corpus into memory:
+the CSVs are read in chunks, the vocabulary and document frequencies are
+built in a first pass, and the classifier is trained incrementally with
+partial_fit in the following passes. Peak memory depends on the chunk size
+and the vocabulary, not on the number of articles.
+
+Cleaning and vectorizing run in a pool of ``--jobs`` worker processes.
+``--classifier logistic`` instead fits the notebook's LogisticRegression
+on the whole training matrix in memory, which is the baseline to compare
+against and supports ``--param-grid`` cross-validated sweeps.
+
+Every stage reports its wall-clock time and the peak RSS so far, and
+``--report`` saves them as JSON.
+
+The artifacts are a fitted TfidfVectorizer and a classifier with
+predict_proba, so inference.load_model reads them just like the notebook's.
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import zip_longest
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import GridSearchCV
+
+from inference import MODEL_PATH, REAL_CLASS, VECTORIZER_PATH
+from preprocessing import clean_texts
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FAKE_CLASS = 0
+CLASSES = np.array([FAKE_CLASS, REAL_CLASS])
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process and its finished
+    workers in MB, or None where the platform does not report it
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+
+class StageReport:
+    """
+    Collects wall-clock time, peak RSS and metrics for each training stage
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        record = {'stage': name}
+        started = time.perf_counter()
+        yield record
+        record['seconds'] = round(time.perf_counter() - started, 3)
+        record['peak_rss_mb'] = peak_rss_mb()
+        self.stages.append(record)
+        details = ', '.join(f'{key}={value}' for key, value in record.items() if key != 'stage')
+        print(f'[{name}] {details}', file=sys.stderr)
+
+
+def is_test_article(text, test_size=0.25):
+    """
+    Deterministically assign an article to the held-out split by hashing it
+    """
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64 < test_size
+
+
+def _read_text_chunks(path, chunksize):
+    for chunk in pd.read_csv(path, usecols=['text'], chunksize=chunksize):
+        yield chunk['text'].fillna('').astype(str).tolist()
+
+
+def iter_chunks(fake_path, true_path, chunksize=5000, split='train', test_size=0.25, seed=42):
+    """
+    Yield raw ``(texts, labels)`` chunks alternating between both CSVs.
+
+    Rows are filtered to the requested ``split`` ('train' or 'test') and
+    shuffled within each chunk, so partial_fit sees both classes throughout.
+    """
+    rng = np.random.default_rng(seed)
+    fake_chunks = _read_text_chunks(fake_path, chunksize)
+    true_chunks = _read_text_chunks(true_path, chunksize)
+    for fake, true in zip_longest(fake_chunks, true_chunks, fillvalue=[]):
+        texts = []
+        labels = []
+        for label, rows in ((FAKE_CLASS, fake), (REAL_CLASS, true)):
+            for text in rows:
+                if is_test_article(text, test_size) == (split == 'test'):
+                    texts.append(text)
+                    labels.append(label)
+        if not texts:
+            continue
+        order = rng.permutation(len(texts))
+        yield [texts[i] for i in order.tolist()], np.asarray(labels)[order]
+
+
+def parallel_map(function, items, executor=None, max_pending=16):
+    """
+    Ordered map over ``items`` that keeps at most ``max_pending`` tasks in
+    flight, so a stream of chunks is never read ahead in full. Runs inline
+    when ``executor`` is None.
+    """
+    if executor is None:
+        yield from map(function, items)
+        return
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def chunk_document_frequency(chunk):
+    """
+    Clean a raw chunk and count the documents containing each term
+    """
+    texts, _ = chunk
+    counter = CountVectorizer(binary=True)
+    try:
+        counts = counter.fit_transform(clean_texts(texts))
+    except ValueError:
+        # Every document in the chunk was empty after cleaning
+        return {}, len(texts)
+    frequencies = np.asarray(counts.sum(axis=0)).ravel().tolist()
+    return dict(zip(counter.get_feature_names_out().tolist(), frequencies)), len(texts)
+
+
+def build_vectorizer(chunks, min_df=1, max_features=None, executor=None):
+    """
+    Fit a TfidfVectorizer from a stream of raw chunks.
+
+    Only the document frequency of each term is kept between chunks, which is
+    all the notebook's TfidfVectorizer() needs to learn.
+    """
+    document_frequency = Counter()
+    n_documents = 0
+    for frequencies, count in parallel_map(chunk_document_frequency, chunks, executor):
+        document_frequency.update(frequencies)
+        n_documents += count
+
+    terms = [term for term, frequency in document_frequency.items() if frequency >= min_df]
+    if max_features is not None:
+        terms = sorted(terms, key=lambda term: (-document_frequency[term], term))[:max_features]
+    terms.sort()
+    frequencies = np.array([document_frequency[term] for term in terms], dtype=np.float64)
+
+    vectorizer = TfidfVectorizer(vocabulary={term: index for index, term in enumerate(terms)})
+    # Smoothed idf, as TfidfVectorizer(smooth_idf=True) computes it
+    vectorizer.idf_ = np.log((1 + n_documents) / (1 + frequencies)) + 1
+    return vectorizer
+
+
+_worker_vectorizer = None
+
+
+def _set_worker_vectorizer(vectorizer):
+    global _worker_vectorizer
+    _worker_vectorizer = vectorizer
+
+
+def transform_chunk(chunk):
+    """
+    Clean and vectorize a raw chunk with the vectorizer of this process
+    """
+    texts, labels = chunk
+    return _worker_vectorizer.transform(clean_texts(texts)), labels
+
+
+@contextmanager
+def transform_pool(vectorizer, jobs):
+    """
+    Yield an executor whose workers hold ``vectorizer``, or None for jobs=1
+    """
+    _set_worker_vectorizer(vectorizer)
+    if jobs <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(jobs, initializer=_set_worker_vectorizer, initargs=(vectorizer,)) as executor:
+        yield executor
+
+
+def train_sgd(matrices, epochs=5, alpha=1e-6, seed=42):
+    """
+    Train a logistic-loss SGDClassifier with one partial_fit per chunk.
+
+    ``matrices`` is called once per epoch and must return a fresh iterator of
+    ``(features, labels)`` chunks.
+    """
+    classifier = SGDClassifier(loss='log_loss', alpha=alpha, random_state=seed)
+    for _ in range(epochs):
+        for features, labels in matrices():
+            classifier.partial_fit(features, labels, classes=CLASSES)
+    return classifier
+
+
+def train_logistic(matrices, solver='lbfgs', C=1.0, max_iter=100, param_grid=None, cv=3, jobs=1, seed=42):
+    """
+    Fit the notebook's LogisticRegression on the stacked training matrix.
+
+    With ``param_grid`` the candidates are cross-validated in parallel over
+    ``jobs`` processes and the best refit model is returned with its scores.
+    """
+    parts = list(matrices())
+    features = sp.vstack([part for part, _ in parts]).tocsr()
+    labels = np.concatenate([part for _, part in parts])
+    classifier = LogisticRegression(solver=solver, C=C, max_iter=max_iter, random_state=seed)
+    if not param_grid:
+        return classifier.fit(features, labels), None
+    search = GridSearchCV(classifier, param_grid, cv=cv, n_jobs=jobs).fit(features, labels)
+    scores = [{'params': params, 'mean_cv_accuracy': round(float(score), 4)}
+              for params, score in zip(search.cv_results_['params'], search.cv_results_['mean_test_score'])]
+    return search.best_estimator_, scores
+
+
+def evaluate(classifier, matrices):
+    """
+    Return the accuracy over a stream of ``(features, labels)`` chunks
+    """
+    correct = total = 0
+    for features, labels in matrices:
+        correct += int((classifier.predict(features) == labels).sum())
+        total += len(labels)
+    return correct / total if total else float('nan')
+
+
+def parse_param_grid(specs):
+    """
+    Parse ``name=v1,v2`` strings into a GridSearchCV parameter grid
+    """
+    grid = {}
+    for spec in specs or []:
+        name, _, values = spec.partition('=')
+        grid[name] = [_parse_value(value) for value in values.split(',')]
+    return grid
+
+
+def _parse_value(value):
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the fake news model from CSVs in bounded memory.')
+    parser.add_argument('--fake', default='Fake.csv', help='CSV of fake articles (text column)')
+    parser.add_argument('--true', default='True.csv', help='CSV of real articles (text column)')
+    parser.add_argument('--chunksize', type=int, default=5000, help='rows read per CSV chunk')
+    parser.add_argument('--test-size', type=float, default=0.25, help='held-out fraction for accuracy')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes for cleaning, vectorizing and sweeps')
+    parser.add_argument('--threads', type=int, default=None, help='BLAS/OpenMP threads per process')
+    parser.add_argument('--classifier', choices=['sgd', 'logistic'], default='sgd',
+                        help='streaming SGD, or in-memory LogisticRegression as in the notebook')
+    parser.add_argument('--epochs', type=int, default=5, help='sgd: passes of partial_fit over the training split')
+    parser.add_argument('--alpha', type=float, default=1e-6, help='sgd: regularization strength')
+    parser.add_argument('--solver', default='lbfgs', help='logistic: LogisticRegression solver')
+    parser.add_argument('--C', type=float, default=1.0, help='logistic: inverse regularization strength')
+    parser.add_argument('--max-iter', type=int, default=100, help='logistic: solver iterations')
+    parser.add_argument('--param-grid', action='append', metavar='NAME=V1,V2',
+                        help='logistic: cross-validate these values, e.g. C=0.1,1,10 (repeatable)')
+    parser.add_argument('--cv', type=int, default=3, help='logistic: folds for --param-grid')
+    parser.add_argument('--min-df', type=int, default=1, help='drop terms seen in fewer documents')
+    parser.add_argument('--max-features', type=int, default=None, help='keep only the most frequent terms')
+    parser.add_argument('--vectorizer-out', default=VECTORIZER_PATH)
+    parser.add_argument('--model-out', default=MODEL_PATH)
+    parser.add_argument('--report', help='write per-stage timings and accuracy to this JSON file')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    if args.param_grid and args.classifier != 'logistic':
+        parser.error('--param-grid requires --classifier logistic')
+
+    def chunks(split):
+        return iter_chunks(args.fake, args.true, args.chunksize, split, args.test_size, args.seed)
+
+    if args.threads is not None:
+        from threadpoolctl import threadpool_limits
+        thread_limit = threadpool_limits(limits=args.threads)
+    else:
+        thread_limit = nullcontext()
+
+    report = StageReport()
+    with thread_limit:
+        with report.stage('vocabulary') as record:
+            with ProcessPoolExecutor(args.jobs) if args.jobs > 1 else nullcontext() as executor:
+                vectorizer = build_vectorizer(chunks('train'), args.min_df, args.max_features, executor)
+            record['terms'] = len(vectorizer.vocabulary_)
+
+        with transform_pool(vectorizer, args.jobs) as executor:
+            def matrices(split='train'):
+                return parallel_map(transform_chunk, chunks(split), executor)
+
+            with report.stage(f'fit_{args.classifier}') as record:
+                if args.classifier == 'sgd':
+                    classifier = train_sgd(matrices, args.epochs, args.alpha, args.seed)
+                else:
+                    classifier, scores = train_logistic(
+                        matrices, args.solver, args.C, args.max_iter,
+                        parse_param_grid(args.param_grid), args.cv, args.jobs, args.seed
+                    )
+                    if scores:
+                        record['sweep'] = scores
+
+            with report.stage('evaluate') as record:
+                record['accuracy'] = round(evaluate(classifier, matrices('test')), 4)
+
+    joblib.dump(vectorizer, args.vectorizer_out)
+    joblib.dump(classifier, args.model_out)
+    print(f'Wrote {args.vectorizer_out} and {args.model_out}', file=sys.stderr)
+
+    if args.report:
+        config = {key: value for key, value in vars(args).items() if key != 'report'}
+        with open(args.report, 'w', encoding='utf-8') as handle:
+            json.dump({'config': config, 'stages': report.stages}, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
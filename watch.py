@@ -0,0 +1,259 @@
+"""
+Watch RSS/Atom feeds and score each new article once.
+
+    python watch.py feeds.txt --store feed_results.jsonl --interval 300
+
+``feeds.txt`` lists one feed URL per line. Feeds are polled with conditional
+GETs (ETag / Last-Modified), so an unchanged feed costs a 304 and no parsing.
+Entries are deduplicated by GUID and by content hash against a persistent
+index in the SQLite state file; only unseen entries are scored, in one batch
+per poll, and appended to the JSONL store. A poll writes only the validators
+and keys that changed, and keys missing from every feed for ``--seen-days``
+are pruned. With ``--dedupe-index`` an entry that nearly duplicates an
+already scored article (a recycled story under a new URL) reuses its verdict
+instead of being scored again.
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import feedparser
+
+from cache import content_key
+from fetch import MAX_WORKERS, FetchError, download_if_changed, fetch_articles
+from inference import analyze_batch, load_model
+from neardup import NearDuplicateIndex, analyze_with_index
+
+TAG = re.compile(r'<[^>]+>')
+
+# Days an entry key is kept after it was last listed by a feed
+SEEN_RETENTION_DAYS = 90
+
+STATE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS feeds (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    modified TEXT
+);
+CREATE TABLE IF NOT EXISTS seen (
+    key TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS seen_last_seen ON seen (last_seen);
+'''
+
+
+class FeedState:
+    """
+    HTTP validators per feed plus the index of entry keys already scored,
+    persisted in SQLite
+    """
+
+    def __init__(self, path, retention_days=SEEN_RETENTION_DAYS):
+        self.path = path
+        self.retention = retention_days * 86400
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(STATE_SCHEMA)
+        self.feeds = {url: {'etag': etag, 'modified': modified}
+                      for url, etag, modified in self._connection.execute('SELECT * FROM feeds')}
+        self._changed_feeds = set()
+
+    def is_seen(self, key):
+        return self._connection.execute('SELECT 1 FROM seen WHERE key = ?', (key,)).fetchone() is not None
+
+    def set_validators(self, url, etag, modified):
+        """
+        Remember a feed's validators, to be written by the next ``save``
+        """
+        validators = {'etag': etag, 'modified': modified}
+        if self.feeds.get(url) != validators:
+            self.feeds[url] = validators
+            self._changed_feeds.add(url)
+
+    def save(self, keys=()):
+        """
+        Write changed validators and mark ``keys`` as seen now in one
+        transaction, then prune keys past the retention period. Does nothing
+        when neither changed, so a poll answered by 304s writes nothing.
+        """
+        keys = list(keys)
+        if not keys and not self._changed_feeds:
+            return
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO feeds (url, etag, modified) VALUES (?, ?, ?)',
+                [(url, self.feeds[url]['etag'], self.feeds[url]['modified']) for url in self._changed_feeds])
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO seen (key, last_seen) VALUES (?, ?)', [(key, now) for key in keys])
+            self._connection.execute('DELETE FROM seen WHERE last_seen < ?', (now - self.retention,))
+        self._changed_feeds.clear()
+
+    def close(self):
+        self._connection.close()
+
+
+def entry_text(entry):
+    """
+    Plain text of a feed entry: its full content if present, else its summary
+    """
+    if entry.get('content'):
+        markup = ' '.join(part.get('value', '') for part in entry.content)
+    else:
+        markup = entry.get('summary', '')
+    return ' '.join(html.unescape(TAG.sub(' ', markup)).split())
+
+
+def entry_keys(entry, text):
+    """
+    Dedupe keys of an entry: its GUID (or link) and a hash of its content
+    """
+    keys = [content_key(f"{entry.get('title', '')}\n{text}", 'feed')]
+    guid = entry.get('id') or entry.get('link')
+    if guid:
+        keys.append(f'guid:{guid}')
+    return keys
+
+
+def poll_feeds(feed_urls, state, max_workers=MAX_WORKERS):
+    """
+    Conditionally download every feed concurrently and return the unseen
+    entries as dicts plus the keys of every entry the changed feeds list.
+    Updates the validators of feeds that changed.
+    """
+    def fetch(url):
+        validators = state.feeds.get(url, {})
+        try:
+            return url, download_if_changed(url, validators.get('etag'), validators.get('modified')), None
+        except FetchError as exc:
+            return url, None, str(exc)
+
+    articles = []
+    batch_keys = set()
+    listed_keys = set()
+    with ThreadPoolExecutor(max_workers) as executor:
+        for url, response, error in executor.map(fetch, feed_urls):
+            if error:
+                print(f'{url}: {error}', file=sys.stderr)
+                continue
+            body, etag, modified = response
+            if body is None:
+                continue
+            for entry in feedparser.parse(body).entries:
+                text = entry_text(entry)
+                keys = entry_keys(entry, text)
+                if any(key in batch_keys or key in listed_keys or state.is_seen(key) for key in keys):
+                    listed_keys.update(keys)
+                    continue
+                batch_keys.update(keys)
+                articles.append({
+                    'id': entry.get('id') or entry.get('link'),
+                    'feed': url,
+                    'title': entry.get('title', ''),
+                    'link': entry.get('link'),
+                    'published': entry.get('published'),
+                    'text': text,
+                    'keys': keys,
+                })
+            state.set_validators(url, etag, modified)
+    return articles, listed_keys
+
+
+def fetch_full_text(articles, max_workers=MAX_WORKERS):
+    """
+    Replace each entry's feed text with its linked page's article text,
+    keeping the feed text when the page cannot be fetched
+    """
+    linked = [article for article in articles if article['link']]
+    results = fetch_articles((article['link'] for article in linked), max_workers=max_workers)
+    for article, (_, page, error) in zip(linked, results):
+        if error is None:
+            article['text'] = page['text']
+
+
+def score_new_articles(articles, store, model, heuristics=True, hybrid=False, index=None):
+    """
+    Score unseen entries in one batch and append them to the JSONL store,
+    reusing the verdicts of near duplicates found in ``index``
+    """
+    scorable = [article for article in articles if article['text'].strip()]
+    texts = [article['text'] for article in scorable]
+    if index is None:
+        results = analyze_batch(texts, model, heuristics, hybrid=hybrid)
+    else:
+        ids = [article['link'] or article['id'] for article in scorable]
+        results = analyze_with_index(ids, texts, index, lambda pending: analyze_batch(
+            pending, model, heuristics, hybrid=hybrid))
+    for article, result in zip(scorable, results):
+        record = {name: value for name, value in article.items() if name not in ('text', 'keys')}
+        store.write(json.dumps({**record, **result}) + '\n')
+    store.flush()
+    return len(scorable)
+
+
+def run_once(feed_urls, state, store, model, heuristics=True, full_text=False, max_workers=MAX_WORKERS,
+             hybrid=False, index=None, index_path=None):
+    """
+    Poll every feed, score its new entries and persist the updated state.
+    Returns the number of articles scored.
+    """
+    articles, listed_keys = poll_feeds(feed_urls, state, max_workers)
+    if full_text and articles:
+        fetch_full_text(articles, max_workers)
+    scored = score_new_articles(articles, store, model, heuristics, hybrid, index) if articles else 0
+    # The store is written before the state, so a crash in between re-scores
+    # entries instead of losing them. Entries still listed are marked again
+    # so they are not pruned while a feed carries them.
+    for article in articles:
+        listed_keys.update(article['keys'])
+    state.save(listed_keys)
+    if index is not None and index_path and scored:
+        index.save(index_path)
+    return scored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('feeds', help='file with one feed URL per line')
+    parser.add_argument('--store', default='feed_results.jsonl', help='JSONL file results are appended to')
+    parser.add_argument('--state', default='feed_state.db', help='SQLite file of validators and seen entries')
+    parser.add_argument('--seen-days', type=float, default=SEEN_RETENTION_DAYS,
+                        help='forget entries no feed has listed for this many days')
+    parser.add_argument('--interval', type=float, default=300, help='seconds between polls')
+    parser.add_argument('--once', action='store_true', help='poll a single time and exit')
+    parser.add_argument('--full-text', action='store_true', help="score the linked page instead of the feed's text")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='concurrent downloads')
+    parser.add_argument('--model-only', action='store_true', help='skip the heuristic factors')
+    parser.add_argument('--hybrid', action='store_true',
+                        help='blend model and heuristics, skipping heuristics when the model is confident')
+    parser.add_argument('--dedupe-index', metavar='PATH', help='near-duplicate index to reuse verdicts from')
+    args = parser.parse_args(argv)
+
+    with open(args.feeds, encoding='utf-8') as f:
+        feed_urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    state = FeedState(args.state, args.seen_days)
+    model = load_model()
+    index = None
+    if args.dedupe_index:
+        index = NearDuplicateIndex.load(args.dedupe_index) if os.path.exists(args.dedupe_index) else NearDuplicateIndex()
+    with open(args.store, 'a', encoding='utf-8') as store:
+        while True:
+            started = time.perf_counter()
+            scored = run_once(feed_urls, state, store, model, not args.model_only,
+                              args.full_text, args.workers, args.hybrid, index, args.dedupe_index)
+            elapsed = time.perf_counter() - started
+            print(f'Polled {len(feed_urls)} feeds, scored {scored} new articles in {elapsed:.2f}s',
+                  file=sys.stderr)
+            if args.once:
+                return
+            time.sleep(max(0.0, args.interval - elapsed))
+
+
+if __name__ == '__main__':
+    main()